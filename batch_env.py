@@ -0,0 +1,350 @@
+import numpy as np
+from constants import GRID_SIZE
+from utils import VISION_DIRECTIONS, ray_table
+from fitness import calculate_fitness
+
+# Same order as SnakeGame.update: Right, Left, Down, Up
+DIRECTIONS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)])
+OPPOSITE = np.array([1, 0, 3, 2])
+VISION = np.array(VISION_DIRECTIONS)
+
+LOOP_WINDOW = 50  # Snake.previous_positions keeps the last 50 heads before the new one
+# Walls and body can only seal the head off once the snake has this many cells: even in
+# a corner the two cells next to the head are joined through a third body cell
+MIN_SEALING_LENGTH = 4
+
+# Why a game stopped before its rules ended it, see BatchSnakeEnv.early_end
+END_CYCLE = 1
+END_DOOMED = 2
+
+class BatchSnakeEnv:
+    """Steps many SnakeGame instances in lockstep with the same rules as SnakeGame.update."""
+
+    def __init__(self, num_games, grid_size=GRID_SIZE, food_positions=None, rng=None,
+                 initial_moves=200, max_moves=500, record=False, cycle_detection=False, doomed_check=False,
+                 food_draws=None):
+        self.num_games = num_games
+        self.grid_size = grid_size
+        self.num_cells = grid_size * grid_size
+        self.rng = rng if rng is not None else np.random
+        self.max_moves = max_moves
+        self.rays, self.wall_steps = ray_table(grid_size)
+        # With record, every tick's directions and every food placement are logged so
+        # any single game can be turned into a GameRecording afterwards
+        self.record = record
+        self.direction_log = []
+        self.food_log = []
+
+        rows = np.arange(num_games)
+        self.rows = rows
+        self.heads = np.full((num_games, 2), grid_size // 2, dtype=np.int64)
+        self.tails = self.heads[:, 0] * grid_size + self.heads[:, 1]
+        self.directions = np.zeros(num_games, dtype=np.int8)
+        self.lengths = np.ones(num_games, dtype=np.int64)
+        self.grow_flags = np.zeros(num_games, dtype=bool)
+
+        # Body cells, and for each body cell the direction towards the next segment,
+        # so the tail can follow the body without storing it as a list.
+        self.occupied = np.zeros((num_games, self.num_cells + 1), dtype=bool)
+        self.trail = np.zeros((num_games, self.num_cells), dtype=np.int8)
+        self.occupied[rows, self.tails] = True
+
+        self.lifetimes = np.zeros(num_games, dtype=np.int64)
+        self.moves = np.full(num_games, initial_moves, dtype=np.int64)
+        self.scores = np.zeros(num_games, dtype=np.int64)
+        self.loop_penalties = np.zeros(num_games, dtype=np.int64)
+        self.previous_positions = np.full((num_games, LOOP_WINDOW), -1, dtype=np.int64)
+        self.previous_index = np.zeros(num_games, dtype=np.int64)
+        # Visited cells as one bit per cell, eight to a byte
+        self.visited = np.zeros((num_games, (self.num_cells + 7) // 8), dtype=np.uint8)
+        self.visited_counts = np.zeros(num_games, dtype=np.int64)
+        self.alive = np.ones(num_games, dtype=bool)
+        self.collided = np.zeros(num_games, dtype=bool)
+
+        if food_positions is None:
+            food_positions = np.zeros((num_games, 0, 2), dtype=np.int64)
+        self.food_positions = np.asarray(food_positions, dtype=np.int64)
+        self.food_index = np.zeros(num_games, dtype=np.int64)
+        # Optional (k, foods) uniform numbers: game r places its n-th free-cell food with
+        # food_draws[r % k, n] instead of self.rng, so its food depends only on its own play
+        self.food_draws = food_draws
+        self.food = np.zeros((num_games, 2), dtype=np.int64)
+        self.place_food(rows)
+
+        self.ticks = 0  # game ticks actually simulated
+        self.ticks_skipped = 0  # ticks that cycle detection proved were not worth simulating
+        self.early_end = np.zeros(num_games, dtype=np.int8)
+
+        # A deterministic policy that sees the same body, direction and food twice without
+        # eating is in an endless loop. States are Zobrist-hashed incrementally and checked
+        # with Brent's algorithm, which needs one saved hash per game.
+        self.cycle_detection = cycle_detection
+        if cycle_detection:
+            keys = np.random.default_rng(grid_size).integers(0, 2 ** 63, size=self.num_cells * 6 + 4, dtype=np.int64)
+            keys = keys.view(np.uint64)
+            self.body_keys = keys[:self.num_cells * 5].reshape(self.num_cells, 5)  # trail direction, or 4 for the head
+            self.food_keys = keys[self.num_cells * 5:self.num_cells * 6]
+            self.direction_keys = keys[self.num_cells * 6:]
+            self.body_hashes = self.body_keys[self.tails, 4].copy()
+            self.tortoise = self.state_hashes(rows)
+            self.power = np.ones(num_games, dtype=np.int64)
+            self.cycle_length = np.zeros(num_games, dtype=np.int64)
+            self.since_food = np.zeros(num_games, dtype=np.int64)
+            self.head_history = np.zeros((num_games, max_moves + 2), dtype=np.int32)
+            self.cycle_starts = np.zeros(num_games, dtype=np.int64)
+            self.cycle_periods = np.zeros(num_games, dtype=np.int64)
+
+        # Optional and approximate: end games whose head is walled in away from the food
+        self.doomed_check = doomed_check
+        if doomed_check:
+            self.entered = np.zeros((num_games, self.num_cells), dtype=np.int32)  # lifetime a cell became the head
+
+    def place_food(self, rows):
+        scripted = self.food_index[rows] < self.food_positions.shape[1]
+        if scripted.any():
+            r = rows[scripted]
+            self.food[r] = self.food_positions[r, self.food_index[r]]
+            self.food_index[r] += 1
+            if self.record:
+                self.food_log.append((r, self.food[r].copy()))
+
+        r = rows[~scripted]
+        if len(r) == 0:
+            return
+        # Uniform over free cells, which is what SnakeGame.place_food's rejection loop samples
+        free = ~self.occupied[r, :self.num_cells]
+        free_counts = free.sum(axis=1)
+        full = free_counts == 0
+        if full.any():
+            # SnakeGame.place_food would spin forever on a full board; end those games instead
+            self.alive[r[full]] = False
+            r, free, free_counts = r[~full], free[~full], free_counts[~full]
+        if self.food_draws is None:
+            draws = self.rng.random(len(r))
+        else:
+            draws = self.food_draws[r % len(self.food_draws), self.scores[r]]
+        targets = (draws * free_counts).astype(np.int64)
+        cells = np.argmax(np.cumsum(free, axis=1) > targets[:, None], axis=1)
+        self.food[r, 0] = cells // self.grid_size
+        self.food[r, 1] = cells % self.grid_size
+        if self.record:
+            self.food_log.append((r, self.food[r].copy()))
+
+    def observe(self):
+        # The 24 values of Snake.look for every live game, zeros for finished ones
+        vision = np.zeros((self.num_games, len(self.wall_steps[0]), 3))
+        rows = np.flatnonzero(self.alive)
+        head_cells = self.heads[rows, 0] * self.grid_size + self.heads[rows, 1]
+        rays = self.rays[head_cells]
+        steps = np.arange(1, self.grid_size + 1)
+
+        # Food is k steps along a ray exactly when food - head = k * direction, so it
+        # needs no scan of the ray
+        offsets = self.food[rows] - self.heads[rows]
+        food_steps = np.abs(offsets).max(axis=1)
+        food_found = (offsets[:, None] == food_steps[:, None, None] * VISION).all(axis=2) & (food_steps > 0)[:, None]
+        vision[rows, :, 0] = np.where(food_found, 1 / np.maximum(food_steps, 1)[:, None], 0)
+
+        # A flat take is the cheapest gather of the (games, 8, grid_size) ray cells
+        body_hits = np.take(self.occupied.reshape(-1), rays + (rows * (self.num_cells + 1))[:, None, None])
+        body_found = body_hits.any(axis=2)
+        vision[rows, :, 1] = np.where(body_found, 1 / steps[np.argmax(body_hits, axis=2)], 0)
+
+        vision[rows, :, 2] = 1 / self.wall_steps[head_cells]
+        return vision.reshape(self.num_games, -1)
+
+    def step(self, actions=None):
+        rows = np.flatnonzero(self.alive)
+        if len(rows) == 0:
+            return self.alive
+
+        if actions is not None:
+            new_directions = np.asarray(actions)[rows]
+            allowed = new_directions != OPPOSITE[self.directions[rows]]
+            self.directions[rows[allowed]] = new_directions[allowed]
+        if self.record:
+            self.direction_log.append(self.directions.copy())
+
+        self.lifetimes[rows] += 1
+        self.moves[rows] -= 1
+
+        self.ticks += len(rows)
+        directions = self.directions[rows]
+        old_heads = self.heads[rows, 0] * self.grid_size + self.heads[rows, 1]
+        self.trail[rows, old_heads] = directions
+        new_heads = self.heads[rows] + DIRECTIONS[directions]
+        in_bounds = ((new_heads >= 0) & (new_heads < self.grid_size)).all(axis=1)
+        new_cells = np.where(in_bounds, new_heads[:, 0] * self.grid_size + new_heads[:, 1], self.num_cells)
+
+        # Move the tail first: the head may enter the cell the tail just left
+        growing = self.grow_flags[rows]
+        shrink = rows[~growing]
+        tails = self.tails[shrink]
+        tail_directions = self.trail[shrink, tails]
+        self.occupied[shrink, tails] = False
+        step = DIRECTIONS[tail_directions]
+        self.tails[shrink] = (tails // self.grid_size + step[:, 0]) * self.grid_size + tails % self.grid_size + step[:, 1]
+        self.lengths[rows[growing]] += 1
+        self.grow_flags[rows] = False
+
+        # Snake.move: loop penalty over the recent heads and the visited set
+        inside = rows[in_bounds]
+        inside_cells = new_cells[in_bounds]
+        repeated = (self.previous_positions[inside] == inside_cells[:, None]).any(axis=1)
+        self.loop_penalties[inside[repeated]] += 2
+        self.previous_positions[inside, self.previous_index[inside]] = inside_cells
+        self.previous_index[inside] = (self.previous_index[inside] + 1) % LOOP_WINDOW
+        visited_bytes = inside_cells >> 3
+        visited_bits = np.left_shift(1, inside_cells & 7).astype(np.uint8)
+        new_cells_visited = ~in_bounds  # leaving the board is always a new position
+        new_cells_visited[in_bounds] = (self.visited[inside, visited_bytes] & visited_bits) == 0
+        self.visited_counts[rows] += new_cells_visited
+        self.visited[inside, visited_bytes] |= visited_bits
+
+        # Snake.check_collision: off the board or into body[1:]
+        collided = ~in_bounds | self.occupied[rows, new_cells]
+        self.occupied[inside, inside_cells] = True
+        self.heads[rows] = new_heads
+        if self.cycle_detection:
+            self.body_hashes[rows] ^= self.body_keys[old_heads, 4] ^ self.body_keys[old_heads, directions]
+            self.body_hashes[shrink] ^= self.body_keys[tails, tail_directions]
+            self.body_hashes[inside] ^= self.body_keys[inside_cells, 4]
+        if self.doomed_check:
+            self.entered[inside, inside_cells] = self.lifetimes[inside]
+        self.collided[rows] = collided
+        self.alive[rows] = ~collided & (self.moves[rows] > 0)
+
+        eating = rows[self.alive[rows] & (self.heads[rows] == self.food[rows]).all(axis=1)]
+        if len(eating):
+            # Snake.grow
+            self.grow_flags[eating] = True
+            self.previous_positions[eating] = -1
+            self.previous_index[eating] = 0
+            self.loop_penalties[eating] = 0
+            self.moves[eating] = np.minimum(self.moves[eating] + 100, self.max_moves)
+            self.scores[eating] += 1
+            self.place_food(eating)
+
+        if self.cycle_detection:
+            self.track_cycles(rows[self.alive[rows]], eating)
+        if self.doomed_check:
+            playing = rows[self.alive[rows] & (self.lengths[rows] >= MIN_SEALING_LENGTH)]
+            doomed = playing[self.find_doomed(playing)]
+            self.alive[doomed] = False
+            self.collided[doomed] = True
+            self.early_end[doomed] = END_DOOMED
+        return self.alive
+
+    def state_hashes(self, rows):
+        food_cells = self.food[rows, 0] * self.grid_size + self.food[rows, 1]
+        return self.body_hashes[rows] ^ self.direction_keys[self.directions[rows]] ^ self.food_keys[food_cells]
+
+    def track_cycles(self, playing, eating):
+        head_cells = self.heads[playing, 0] * self.grid_size + self.heads[playing, 1]
+        self.since_food[playing] += 1
+        self.head_history[playing, self.since_food[playing]] = head_cells
+
+        self.since_food[eating] = 0
+        self.tortoise[eating] = self.state_hashes(eating)
+        self.power[eating] = 1
+        self.cycle_length[eating] = 0
+
+        searching = np.setdiff1d(playing, eating, assume_unique=True)
+        hashes = self.state_hashes(searching)
+        self.cycle_length[searching] += 1
+        looping = hashes == self.tortoise[searching]
+        if looping.any():
+            self.end_cycles(searching[looping], self.cycle_length[searching[looping]])
+        searching, hashes = searching[~looping], hashes[~looping]
+        restart = self.cycle_length[searching] == self.power[searching]
+        self.tortoise[searching[restart]] = hashes[restart]
+        self.power[searching[restart]] *= 2
+        self.cycle_length[searching[restart]] = 0
+
+    def end_cycles(self, games, periods):
+        # Fast-forward to where the move budget would have run out. Within the cycle no
+        # new cell is visited and nothing collides, so only lifetime, the final head and
+        # the loop penalty change.
+        for game, period in zip(games, periods):
+            remaining = self.moves[game]
+            newest = self.since_food[game]
+            cycle = self.head_history[game, newest - period + 1:newest + 1]
+            if period <= LOOP_WINDOW:
+                repeats = remaining
+            else:
+                window = (np.arange(period)[:, None] - np.arange(1, LOOP_WINDOW + 1)) % period
+                repeated = (cycle[window] == cycle[:, None]).any(axis=1)
+                repeats = remaining // period * repeated.sum() + repeated[:remaining % period].sum()
+            final_head = cycle[(remaining - 1) % period]
+            self.heads[game] = (final_head // self.grid_size, final_head % self.grid_size)
+            self.loop_penalties[game] += 2 * repeats
+            self.cycle_starts[game] = self.lifetimes[game]
+            self.cycle_periods[game] = period
+            self.lifetimes[game] += remaining
+            self.moves[game] = 0
+        self.alive[games] = False
+        self.early_end[games] = END_CYCLE
+        self.ticks_skipped += int(self.lifetimes[games].sum() - self.cycle_starts[games].sum())
+
+    def find_doomed(self, games):
+        # A head that cannot reach the food through free cells, and whose region runs out
+        # before any body segment bordering it moves away, must collide without eating.
+        if len(games) == 0:
+            return np.zeros(0, dtype=bool)
+        size = self.grid_size
+        free = ~self.occupied[games, :self.num_cells].reshape(-1, size, size)
+        index = np.arange(len(games))
+        reach = np.zeros_like(free)
+        reach[index, self.heads[games, 0], self.heads[games, 1]] = True
+        while True:
+            grown = _dilate(reach)
+            grown &= free | reach
+            if (grown == reach).all():
+                break
+            reach = grown
+
+        food_reachable = reach[index, self.food[games, 0], self.food[games, 1]]
+        region_size = reach.sum(axis=(1, 2)) - 1
+        border = (_dilate(reach) & ~free & ~reach).reshape(len(games), -1)
+        tail_entered = self.entered[games, self.tails[games]]
+        vacate = self.entered[games] - tail_entered[:, None] + 1 + self.grow_flags[games][:, None]
+        first_vacate = np.where(border, vacate, np.iinfo(np.int32).max).min(axis=1)
+        return ~food_reachable & (first_vacate > region_size + 1)
+
+    def fitness(self):
+        # SnakeGame only counts its own score, so Snake.calculate_fitness always sees a
+        # snake score of 0; keep that so both evaluators rank networks the same way.
+        return calculate_fitness(self.lifetimes, np.zeros(self.num_games, dtype=np.int64),
+                                 self.loop_penalties, self.heads, self.food,
+                                 self.visited_counts, self.collided)
+
+    def recording(self, game):
+        from recording import GameRecording
+
+        played = self.cycle_starts[game] if self.early_end[game] == END_CYCLE else self.lifetimes[game]
+        actions = np.array([directions[game] for directions in self.direction_log[:played]], dtype=np.uint8)
+        if played < self.lifetimes[game]:
+            # The skipped ticks repeat the detected cycle
+            cycle = actions[played - self.cycle_periods[game]:]
+            actions = np.concatenate([actions, np.resize(cycle, self.lifetimes[game] - played)])
+        food = [food[rows == game][0] for rows, food in self.food_log if (rows == game).any()]
+        return GameRecording(self.grid_size, np.array(food, dtype=np.int64).reshape(-1, 2), actions)
+
+    def snake_body(self, game):
+        # Head-first list of segments, as in Snake.body
+        body = []
+        cell = self.tails[game]
+        for _ in range(self.lengths[game] - 1):
+            body.append((cell // self.grid_size, cell % self.grid_size))
+            step = DIRECTIONS[self.trail[game, cell]]
+            cell = (cell // self.grid_size + step[0]) * self.grid_size + cell % self.grid_size + step[1]
+        body.append(tuple(self.heads[game]))
+        return [tuple(int(v) for v in segment) for segment in reversed(body)]
+
+def _dilate(cells):
+    grown = cells.copy()
+    grown[:, 1:] |= cells[:, :-1]
+    grown[:, :-1] |= cells[:, 1:]
+    grown[:, :, 1:] |= cells[:, :, :-1]
+    grown[:, :, :-1] |= cells[:, :, 1:]
+    return grown
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+import numpy as np
+from game import SnakeGame
+from genetic_algorithm import GeneticAlgorithm
+from batch_env import BatchSnakeEnv
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from snake import Snake
+
+# Seeded benchmarks of the simulation, inference and GA hot paths: python -m benchmark --help.
+# Every result is the best of --repeat runs. Results are JSON so a later run can be
+# checked against a stored baseline with --baseline.
+
+POPULATION_SIZES = (500, 3000)
+GRID_SIZES = (10, 40, 100)
+SEED = 1234
+
+def seed_all(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+
+def best_time(run, repeat):
+    # run() does its own setup outside the timed part and returns (seconds, work done)
+    return min((run() for _ in range(repeat)), key=lambda result: result[0] / max(result[1], 1))
+
+def result(value, unit, higher_is_better=True):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+def random_snake(grid_size, length):
+    # A snake that has wandered around the board for a while, so rays stop at its body
+    snake = Snake((grid_size // 2, grid_size // 2), grid_size)
+    directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+    while len(snake.body) < length:
+        x, y = snake.body[0]
+        options = [(dx, dy) for dx, dy in directions
+                   if 0 <= x + dx < grid_size and 0 <= y + dy < grid_size and not snake.occupies((x + dx, y + dy))]
+        if not options:
+            break
+        dx, dy = random.choice(options)
+        snake.push_head((x + dx, y + dy))
+    food = next((x, y) for x in range(grid_size) for y in range(grid_size) if not snake.occupies((x, y)))
+    return snake, food
+
+def bench_snake_update(repeat, grid_sizes, games=200):
+    results = {}
+    for grid_size in grid_sizes:
+        def run():
+            seed_all()
+            network = NeuralNetwork()
+            game_list = [SnakeGame(render=False, grid_size=grid_size) for _ in range(games)]
+            for game in game_list:
+                game.neural_network = network
+            started = time.perf_counter()
+            for game in game_list:
+                while game.update():
+                    pass
+            return time.perf_counter() - started, sum(game.snake.lifetime for game in game_list)
+        seconds, ticks = best_time(run, repeat)
+        results[f'snake_update/grid={grid_size}'] = result(ticks / seconds, 'ticks/s')
+    return results
+
+def bench_vision(repeat, grid_sizes, calls=20000):
+    results = {}
+    for grid_size in grid_sizes:
+        def run():
+            seed_all()
+            snake, food = random_snake(grid_size, grid_size * grid_size // 4)
+            started = time.perf_counter()
+            for _ in range(calls):
+                snake.look(food, grid_size)
+            return time.perf_counter() - started, calls
+        seconds, work = best_time(run, repeat)
+        results[f'vision/grid={grid_size}'] = result(work / seconds, 'looks/s')
+    return results
+
+def bench_forward(repeat, population_sizes, calls=20000):
+    def run_single():
+        seed_all()
+        network = NeuralNetwork()
+        x = np.random.rand(24, 1)
+        started = time.perf_counter()
+        for _ in range(calls):
+            network.forward(x)
+        return time.perf_counter() - started, calls
+    seconds, work = best_time(run_single, repeat)
+    results = {'forward/single': result(work / seconds, 'passes/s')}
+
+    for size in population_sizes:
+        def run_batch():
+            seed_all()
+            population = NetworkPopulation(size)
+            observations = np.random.rand(size, 1, 24).astype(np.float32)
+            started = time.perf_counter()
+            for _ in range(20):
+                population.forward_batch(observations)
+            return time.perf_counter() - started, 20 * size
+        seconds, work = best_time(run_batch, repeat)
+        results[f'forward/batch/population={size}'] = result(work / seconds, 'passes/s')
+    return results
+
+def bench_batch_env(repeat, population_sizes, grid_sizes):
+    # Vectorised simulation alone, with random moves standing in for the networks
+    results = {}
+    for size in population_sizes:
+        for grid_size in grid_sizes:
+            def run():
+                seed_all()
+                env = BatchSnakeEnv(size, grid_size=grid_size, rng=np.random.RandomState(SEED), cycle_detection=True)
+                moves = np.random.randint(0, 4, size=(500, size))
+                started = time.perf_counter()
+                tick = 0
+                while env.alive.any():
+                    env.observe()
+                    env.step(moves[tick % len(moves)])
+                    tick += 1
+                return time.perf_counter() - started, env.ticks
+            seconds, ticks = best_time(run, repeat)
+            results[f'batch_env/population={size}/grid={grid_size}'] = result(ticks / seconds, 'ticks/s')
+    return results
+
+def bench_generation(repeat, population_sizes, grid_sizes):
+    results = {}
+    for size in population_sizes:
+        def run_turnover():
+            seed_all()
+            gen_alg = GeneticAlgorithm(population_size=size, seed=SEED)
+            gen_alg.fitness_scores = np.random.rand(size)
+            gen_alg.fitness_scores /= gen_alg.fitness_scores.sum()
+            started = time.perf_counter()
+            gen_alg.create_new_generation()
+            return time.perf_counter() - started, 1
+        seconds, _ = best_time(run_turnover, repeat)
+        results[f'turnover/population={size}'] = result(seconds, 's', higher_is_better=False)
+
+        for grid_size in grid_sizes:
+            def run_generation():
+                seed_all()
+                gen_alg = GeneticAlgorithm(population_size=size, grid_size=grid_size, seed=SEED)
+                started = time.perf_counter()
+                asyncio.run(gen_alg.evaluate_fitness(SnakeGame))
+                gen_alg.create_new_generation()
+                gen_alg.evaluator.close()
+                return time.perf_counter() - started, 1
+            seconds, _ = best_time(run_generation, repeat)
+            results[f'generation/population={size}/grid={grid_size}'] = result(seconds, 's', higher_is_better=False)
+    return results
+
+BENCHMARKS = ('snake_update', 'vision', 'forward', 'batch_env', 'generation')
+
+def run_benchmarks(names=BENCHMARKS, population_sizes=POPULATION_SIZES, grid_sizes=GRID_SIZES, repeat=3):
+    results = {}
+    for name in names:
+        if name == 'snake_update':
+            results.update(bench_snake_update(repeat, grid_sizes))
+        elif name == 'vision':
+            results.update(bench_vision(repeat, grid_sizes))
+        elif name == 'forward':
+            results.update(bench_forward(repeat, population_sizes))
+        elif name == 'batch_env':
+            results.update(bench_batch_env(repeat, population_sizes, grid_sizes))
+        elif name == 'generation':
+            results.update(bench_generation(repeat, population_sizes, grid_sizes))
+        else:
+            raise ValueError(f"Unknown benchmark {name!r}, expected one of {BENCHMARKS}")
+    return results
+
+def compare(results, baseline, threshold):
+    # Relative change of every metric in both runs, positive meaning better; a change
+    # below -threshold is a regression. From a baseline of 0 any change is infinite.
+    comparison = {}
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        before, now = baseline[name]['value'], current['value']
+        change = now - before if current['higher_is_better'] else before - now
+        if before:
+            change /= abs(before)
+        elif change:
+            change = float('inf') if change > 0 else float('-inf')
+        comparison[name] = {'baseline': before, 'value': now, 'change': change, 'regression': change < -threshold}
+    return comparison
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark the snake simulation, inference and GA.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--population-sizes", nargs="+", type=int, default=list(POPULATION_SIZES))
+    parser.add_argument("--grid-sizes", nargs="+", type=int, default=list(GRID_SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown against the baseline that counts as a regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.only, args.population_sizes, args.grid_sizes, args.repeat)
+    report = {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                 'seed': SEED, 'repeat': args.repeat, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    for name, metric in results.items():
+        print(f"{name:45s} {metric['value']:14.4f} {metric['unit']}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(results, json.load(f)['results'], args.threshold)
+        for name, change in report['comparison'].items():
+            if change['regression']:
+                regressions.append(name)
+            print(f"{name:45s} {change['change']:+8.1%}{'  REGRESSION' if change['regression'] else ''}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
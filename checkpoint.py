@@ -0,0 +1,230 @@
+import json
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import numpy as np
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from seeding import SeedStreams
+from utils import write_atomic
+
+# Checkpoint layout: MAGIC, a little-endian uint64 header length, a JSON header, then
+# raw array sections, each aligned to ALIGNMENT bytes so the genomes can be memory-mapped.
+MAGIC = b'SNAKECK1'
+ALIGNMENT = 64
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def checkpoint_state(gen_alg):
+    # The whole GA state: every genome, fitness, counters and both RNG states. The arrays
+    # are copies, so the state can be written while the next generation is bred.
+    np_state = np.random.get_state()
+    arrays = {
+        'genomes': np.array(gen_alg.networks.genomes, order='C'),
+        'fitness_scores': np.array(gen_alg.fitness_scores, dtype=np.float64),
+        'fitness_history': np.array(gen_alg.fitness_history, dtype=np.float64).reshape(-1, 2),
+        'np_random_keys': np.array(np_state[1], dtype=np.uint32),
+    }
+    header = {
+        'layer_sizes': gen_alg.networks.layer_sizes,
+        'generation': gen_alg.generation,
+        'population_size': gen_alg.population_size,
+        'mutation_rate': gen_alg.mutation_rate,
+        'seed_entropy': gen_alg.seeds.entropy,
+        'random_state': random.getstate(),
+        'np_random_state': [np_state[0], int(np_state[2]), int(np_state[3]), float(np_state[4])],
+    }
+    if hasattr(gen_alg, 'adam_m'):
+        # EvolutionStrategy's optimizer state
+        arrays['adam_m'] = gen_alg.adam_m.copy()
+        arrays['adam_v'] = gen_alg.adam_v.copy()
+        header['adam_steps'] = gen_alg.adam_steps
+    return header, arrays
+
+def write_checkpoint(path, header, arrays):
+    # Returns the number of bytes written
+    header = dict(header, arrays={})
+    # Offsets are relative to the end of the header, so they don't depend on its length
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        header['arrays'][name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+    chunks = [MAGIC, struct.pack('<Q', len(header_bytes)), header_bytes]
+    position = data_start
+    chunks.append(b'\0' * (data_start - len(MAGIC) - 8 - len(header_bytes)))
+    for name, array in arrays.items():
+        start = data_start + header['arrays'][name]['offset']
+        chunks.append(b'\0' * (start - position))
+        chunks.append(array.tobytes())
+        position = start + array.nbytes
+    return write_atomic(path, chunks)
+
+def save_checkpoint(gen_alg, path):
+    return write_checkpoint(path, *checkpoint_state(gen_alg))
+
+def read_checkpoint(path):
+    # Returns the header and its arrays; the genomes are a copy-on-write memory map
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a snake checkpoint")
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length))
+    data_start = _align(len(MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, section in header['arrays'].items():
+        shape, dtype = tuple(section['shape']), np.dtype(section['dtype'])
+        if name == 'genomes':
+            arrays[name] = np.memmap(path, dtype=dtype, mode='c', offset=data_start + section['offset'], shape=shape)
+        else:
+            with open(path, 'rb') as f:
+                f.seek(data_start + section['offset'])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return header, arrays
+
+def load_checkpoint(gen_alg, path):
+    header, arrays = read_checkpoint(path)
+    layer_sizes = header['layer_sizes']
+    genomes = arrays['genomes']
+    # Set before the population, as EvolutionStrategy samples its perturbations from them.
+    # Its genomes are theta plus population_size perturbations.
+    gen_alg.population_size = header.get('population_size', len(genomes))
+    gen_alg.generation = header['generation']
+    gen_alg.mutation_rate = header['mutation_rate']
+    if 'seed_entropy' in header:
+        gen_alg.seeds = SeedStreams(header['seed_entropy'])
+    gen_alg.population = NetworkPopulation(len(genomes), layer_sizes[0], layer_sizes[1:-1], layer_sizes[-1], genomes)
+    if 'adam_m' in arrays:
+        gen_alg.adam_m = np.array(arrays['adam_m'])
+        gen_alg.adam_v = np.array(arrays['adam_v'])
+        gen_alg.adam_steps = header['adam_steps']
+    gen_alg.fitness_scores = arrays['fitness_scores']
+    gen_alg.fitness_history = [tuple(row) for row in arrays['fitness_history'].tolist()]
+
+    version, internal_state, gauss_next = header['random_state']
+    random.setstate((version, tuple(internal_state), gauss_next))
+    name, pos, has_gauss, cached_gaussian = header['np_random_state']
+    np.random.set_state((name, arrays['np_random_keys'], pos, has_gauss, cached_gaussian))
+    return gen_alg
+
+def _link_latest(source, path):
+    # Points path at source's content atomically; a copy where hard links are not supported
+    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.link')
+    try:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        os.link(source, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        with open(source, 'rb') as f:
+            write_atomic(path, iter(lambda: f.read(1 << 20), b''))
+
+class CheckpointWriter:
+    """Writes checkpoints from a background thread and prunes them by a retention policy.
+
+    save() snapshots the GA state and returns, so the next generation is bred while the
+    disk works. Every save writes gameN_genG.ckpt and gameN_genG.json, then points
+    gameN_checkpoint.ckpt and gameN_progress.json at them. Of the generation files, the
+    last keep_last, every keep_every-th generation and, with keep_best, the one with the
+    best fitness so far are kept. At most max_pending snapshots wait for the disk; save()
+    blocks beyond that rather than hold an unbounded number of populations in memory.
+    """
+
+    def __init__(self, save_folder, game_number, keep_last=3, keep_every=0, keep_best=True, max_pending=2):
+        if keep_last < 1:
+            raise ValueError(f"Need to keep at least the last checkpoint, got keep_last={keep_last}")
+        if keep_every < 0:
+            raise ValueError(f"keep_every must be 0 (off) or a number of generations, got {keep_every}")
+        self.save_folder = save_folder
+        self.game_number = game_number
+        self.keep_last = keep_last
+        self.keep_every = keep_every
+        self.keep_best = keep_best
+        self.generations = []  # generations whose files are on disk, oldest first
+        self.best = None  # (fitness, generation)
+        self.completed = []  # {'generation', 'seconds', 'bytes'} of every write not yet drained
+        self.error = None
+        self.snapshots = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def path(self, name):
+        return os.path.join(self.save_folder, f"game{self.game_number}_{name}")
+
+    def save(self, gen_alg):
+        if self.error is not None:
+            raise self.error
+        header, arrays = checkpoint_state(gen_alg)
+        best = gen_alg.best_network()
+        sizes = best.layer_sizes
+        network = NeuralNetwork(sizes[0], sizes[1:-1], sizes[-1], [w.copy() for w in best.weights],
+                                [b.copy() for b in best.biases])
+        fitness = gen_alg.fitness_history[-1][0] if gen_alg.fitness_history else float('-inf')
+        self.snapshots.put((header, arrays, network, fitness))
+
+    def _run(self):
+        while True:
+            snapshot = self.snapshots.get()
+            if snapshot is None:
+                return
+            try:
+                if self.error is None:
+                    self._write(*snapshot)
+            except Exception as error:
+                self.error = error
+
+    def _write(self, header, arrays, network, fitness):
+        started = time.perf_counter()
+        generation = header['generation']
+        checkpoint_path = self.path(f"gen{generation}.ckpt")
+        model_path = self.path(f"gen{generation}.json")
+        written = write_checkpoint(checkpoint_path, header, arrays) + network.save(model_path)
+        _link_latest(checkpoint_path, self.path("checkpoint.ckpt"))
+        _link_latest(model_path, self.path("progress.json"))
+
+        if generation not in self.generations:
+            self.generations.append(generation)
+        if self.best is None or fitness > self.best[0]:
+            self.best = (fitness, generation)
+        self.prune()
+        self.completed.append({'generation': generation, 'seconds': time.perf_counter() - started, 'bytes': written})
+
+    def retained(self):
+        keep = set(self.generations[-self.keep_last:])
+        if self.keep_every:
+            keep.update(g for g in self.generations if g % self.keep_every == 0)
+        if self.keep_best and self.best is not None:
+            keep.add(self.best[1])
+        return keep
+
+    def prune(self):
+        keep = self.retained()
+        for generation in [g for g in self.generations if g not in keep]:
+            for extension in ('ckpt', 'json'):
+                try:
+                    os.unlink(self.path(f"gen{generation}.{extension}"))
+                except FileNotFoundError:
+                    pass
+            self.generations.remove(generation)
+
+    def drain(self):
+        # Write stats finished since the last drain; list.pop is atomic against the writer
+        finished = []
+        while self.completed:
+            finished.append(self.completed.pop(0))
+        return finished
+
+    def close(self):
+        # Returns once every queued snapshot is on disk
+        self.snapshots.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
@@ -1,4 +1,5 @@
 # constants.py
+import os
 
 # Screen dimensions
 SCREEN_WIDTH, SCREEN_HEIGHT = 1200, 800
@@ -13,4 +14,7 @@ BLACK = (0, 0, 0)
 GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
-GRAY = (128, 128, 128)
\ No newline at end of file
+GRAY = (128, 128, 128)
+
+# Where models, checkpoints and telemetry are saved
+SAVE_DIR = os.environ.get("SNAKE_SAVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
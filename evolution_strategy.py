@@ -0,0 +1,190 @@
+import logging
+import os
+import time
+import numpy as np
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from parallel_eval import ParallelEvaluator, PER_NETWORK_STATS
+from game import SnakeGame
+from constants import GRID_SIZE
+from seeding import SeedStreams
+
+_noise_tables = {}
+
+def noise_table(seed, size):
+    # The same table in every process, built once per process from its seed
+    key = (seed, size)
+    if key not in _noise_tables:
+        _noise_tables[key] = np.random.default_rng(seed).standard_normal(size, dtype=np.float32)
+    return _noise_tables[key]
+
+def perturbed_genomes(theta, table, offsets, signs, sigma):
+    # Row i is theta + sign_i * sigma * table[offset_i:offset_i + len(theta)]
+    noise = table[offsets[:, None] + np.arange(len(theta))]
+    return theta + (sigma * signs[:, None]).astype(np.float32) * noise
+
+def centered_ranks(returns):
+    # Returns mapped to evenly spaced values in [-0.5, 0.5] by rank. Tied returns share
+    # their mean rank, so pairs that both hit the same wall add nothing to the gradient.
+    order = np.argsort(returns, kind='stable')
+    ranks = np.empty(len(returns))
+    ranks[order] = np.arange(len(returns))
+    _, tie_groups, tie_counts = np.unique(returns, return_inverse=True, return_counts=True)
+    ranks = (np.bincount(tie_groups, weights=ranks) / tie_counts)[tie_groups]
+    return ranks / max(len(returns) - 1, 1) - 0.5
+
+def _evaluate_candidates(start, end, games_per_network, seed, record, options, theta, layer_sizes,
+                         table_seed, table_size, offsets, signs, sigma):
+    # Runs in a worker: only theta, the noise offsets and the signs cross the process boundary
+    from genetic_algorithm import evaluate_population
+
+    genomes = perturbed_genomes(theta, noise_table(table_seed, table_size), offsets[start:end], signs[start:end], sigma)
+    candidates = NetworkPopulation(end - start, layer_sizes[0], layer_sizes[1:-1], layer_sizes[-1], genomes)
+    rng = np.random.RandomState(seed) if seed is not None else None
+    return evaluate_population(candidates, games_per_network, rng, record, **options)
+
+class EvolutionStrategy:
+    """OpenAI-style evolution strategy over the same genome layout as GeneticAlgorithm.
+
+    Every generation evaluates the current parameters theta and population_size
+    antithetic perturbations theta +- sigma * eps, with eps read from a shared noise
+    table at random offsets. The centered ranks of their fitness weight the noise into
+    a gradient estimate that Adam follows. All candidates of a generation play the same
+    food, so the two sides of a pair differ only by their noise.
+
+    Has the attributes and methods train() uses, so it can replace GeneticAlgorithm
+    there; mutation_rate is sigma.
+    """
+
+    def __init__(self, population_size=3000, sigma=0.1, learning_rate=0.03, l2_coefficient=0.005,
+                 noise_table_size=2 ** 22, noise_seed=0, backend='serial', workers=None, record_best=False,
+                 cycle_detection=True, doomed_check=False, eval_seed=None, max_generations=5000, grid_size=GRID_SIZE,
+                 seed=None):
+        if population_size % 2:
+            raise ValueError(f"Antithetic sampling needs an even population size, got {population_size}")
+        self.population_size = population_size
+        self.sigma = sigma
+        self.learning_rate = learning_rate
+        self.l2_coefficient = l2_coefficient
+        self.noise_seed = noise_seed
+        self.noise_table_size = noise_table_size
+        self.max_generations = max_generations
+        self.record_best = record_best
+        self.eval_seed = eval_seed
+        self.seeds = SeedStreams(seed)
+        self.grid_size = grid_size
+        self.evaluator = ParallelEvaluator(backend, workers, cycle_detection=cycle_detection, doomed_check=doomed_check,
+                                           grid_size=grid_size)
+        self.generation = 0
+        self.fitness_scores = []
+        self.fitness_history = []  # (best, mean) raw fitness of every evaluated generation
+        self.raw_fitness = None
+        self.best_genome = None
+        self.best_recording = None
+        self.evaluation_stats = {}
+        self.turnover_times = {}
+        layout = NetworkPopulation(0, hidden_layer_sizes=[32, 32])
+        self.population = layout.like(self.seeds.generator(0, 'population').standard_normal(
+            (1, layout.num_params), dtype=np.float32))
+
+    @property
+    def mutation_rate(self):
+        return self.sigma
+
+    @mutation_rate.setter
+    def mutation_rate(self, sigma):
+        self.sigma = sigma
+
+    @property
+    def population(self):
+        return self.networks
+
+    @population.setter
+    def population(self, networks):
+        # Row 0 is theta; the rest are the perturbations of the coming generation
+        if not isinstance(networks, NetworkPopulation):
+            networks = NetworkPopulation.from_networks(networks)
+        self.layer_sizes = networks.layer_sizes
+        self.theta = np.array(networks.genomes[0], dtype=np.float32)
+        self.table = noise_table(self.noise_seed, self.noise_table_size)
+        if len(self.theta) > self.noise_table_size:
+            raise ValueError(f"Noise table of {self.noise_table_size} values is smaller than a genome")
+        self.adam_m = np.zeros_like(self.theta)
+        self.adam_v = np.zeros_like(self.theta)
+        self.adam_steps = 0
+        self.sample_perturbations()
+
+    def sample_perturbations(self):
+        num_pairs = self.population_size // 2
+        rng = self.seeds.generator(self.generation, 'perturbation')
+        pair_offsets = rng.integers(0, len(self.table) - len(self.theta) + 1, size=num_pairs)
+        # Row 0 is theta itself, then each offset once with + and once with -
+        self.offsets = np.concatenate([[0], np.repeat(pair_offsets, 2)])
+        self.signs = np.concatenate([[0.0], np.tile([1.0, -1.0], num_pairs)])
+        genomes = perturbed_genomes(self.theta, self.table, self.offsets, self.signs, self.sigma)
+        self.networks = NetworkPopulation(len(genomes), self.layer_sizes[0], self.layer_sizes[1:-1],
+                                          self.layer_sizes[-1], genomes)
+
+    def best_network(self):
+        return self.networks.like(self.best_genome[None]).network(0)
+
+    def seed_population(self, model_paths, strategy='clone', noise_scale=0.1, fresh_fraction=0.5):
+        # Starts theta at the mean of the saved models; the perturbations already add the
+        # noise, so the GA's seeding strategies don't apply
+        if isinstance(model_paths, (str, os.PathLike)):
+            model_paths = [model_paths]
+        models = []
+        for path in model_paths:
+            network = NeuralNetwork()
+            network.load(path)
+            if [w.shape for w in network.weights] != self.networks.weight_shapes:
+                raise ValueError(f"{path} does not match the layer sizes {self.layer_sizes}")
+            models.append(network)
+        theta = NetworkPopulation.from_networks(models).genomes.mean(axis=0, keepdims=True)
+        self.population = self.networks.like(theta.astype(np.float32))
+
+    async def evaluate_fitness(self, game_class=SnakeGame, games_per_network=1):
+        if game_class is not SnakeGame:
+            raise ValueError("EvolutionStrategy only evaluates SnakeGame")
+        food_seed = self.eval_seed if self.eval_seed is not None else self.seeds.food_seed(self.generation)
+        fitness, stats = self.evaluator.evaluate_shards(
+            _evaluate_candidates, len(self.offsets), games_per_network, self.record_best, food_seed,
+            self.theta, self.layer_sizes, self.noise_seed, self.noise_table_size, self.offsets, self.signs, self.sigma)
+        self.best_recording = stats.pop('best_recording', None)
+        for key in ('best_fitness',) + PER_NETWORK_STATS:
+            stats.pop(key, None)
+        self.evaluation_stats = stats
+        self.raw_fitness = fitness
+        self.fitness_scores = fitness
+        # Best is over the perturbations and theta; theta's own fitness is logged as well
+        self.fitness_history.append((float(np.max(fitness)), float(np.mean(fitness))))
+        self.best_genome = self.networks.genomes[np.argmax(fitness)].copy()
+        logging.debug("Generation %d: theta fitness %.1f", self.generation, fitness[0])
+
+    def create_new_generation(self):
+        started = time.perf_counter()
+        # Gradient estimate from the antithetic pairs, in noise-table slices
+        shaped = centered_ranks(self.raw_fitness[1:]).reshape(-1, 2)
+        weights = shaped[:, 0] - shaped[:, 1]
+        pair_offsets = self.offsets[1::2]
+        gradient = np.zeros_like(self.theta)
+        for start in range(0, len(weights), 256):
+            noise = self.table[pair_offsets[start:start + 256, None] + np.arange(len(self.theta))]
+            gradient += weights[start:start + 256].astype(np.float32) @ noise
+        gradient /= (len(self.raw_fitness) - 1) * self.sigma
+        gradient -= self.l2_coefficient * self.theta
+        estimated = time.perf_counter()
+
+        # Adam, climbing the fitness
+        beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+        self.adam_steps += 1
+        self.adam_m = beta1 * self.adam_m + (1 - beta1) * gradient
+        self.adam_v = beta2 * self.adam_v + (1 - beta2) * gradient * gradient
+        step_size = self.learning_rate * np.sqrt(1 - beta2 ** self.adam_steps) / (1 - beta1 ** self.adam_steps)
+        self.theta += (step_size * self.adam_m / (np.sqrt(self.adam_v) + epsilon)).astype(np.float32)
+        updated = time.perf_counter()
+
+        self.generation += 1
+        self.sample_perturbations()
+        self.turnover_times = {'gradient': estimated - started, 'update': updated - estimated,
+                               'sampling': time.perf_counter() - updated}
@@ -0,0 +1,20 @@
+import numpy as np
+
+# The snake fitness formula, written once over arrays of per-game statistics so the
+# batched environment scores a whole population in one call and Snake scores its
+# single game through the same code.
+
+def calculate_fitness(lifetimes, scores, loop_penalties, heads, food, visited_counts, collided):
+    # heads and food are (games, 2); everything else has one entry per game
+    lifetimes = np.asarray(lifetimes).astype(np.float64)
+    scores = np.asarray(scores)
+    fitness = np.where(scores < 10,
+                       lifetimes * 2.0 ** np.minimum(scores, 10),
+                       lifetimes * 2.0 ** 10 * (scores - 9))
+    fitness -= np.asarray(loop_penalties) * 500
+    distance_to_food = np.abs(np.asarray(heads) - np.asarray(food)).sum(axis=1)
+    fitness += (1 / (distance_to_food + 1)) * 1000
+    fitness += np.asarray(visited_counts) * 500
+    fitness += scores * 5000
+    fitness -= np.asarray(collided) * 2000
+    return fitness
@@ -0,0 +1,56 @@
+import hashlib
+from collections import OrderedDict
+
+class FitnessCache:
+    """Bounded LRU map from a genome's bytes and its evaluation settings to its fitness.
+
+    GeneticAlgorithm stores (fitness, best score, total lifetime, games) per genome.
+
+    Only valid when evaluation is deterministic, i.e. with seeded food, so that the
+    same genome under the same settings always plays the same games.
+    """
+
+    def __init__(self, max_entries=10000):
+        if max_entries < 1:
+            raise ValueError(f"Fitness cache needs room for at least one entry, got {max_entries}")
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def genome_keys(genomes, *settings):
+        # 128-bit BLAKE2 digest of every genome row, plus whatever else decides its games
+        return [(hashlib.blake2b(row.data, digest_size=16).digest(),) + settings for row in genomes]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate}
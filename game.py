@@ -2,13 +2,15 @@ import logging
 import random
 from snake import Snake
 import numpy as np
-from constants import GRID_SIZE, SNAKE_SIZE, WHITE, RED
-import pygame
+from constants import GRID_SIZE, SCREEN_HEIGHT, WHITE, RED
 
 class SnakeGame:
-    def __init__(self, render=True, food_positions=None):
-        initial_position = (GRID_SIZE // 2, GRID_SIZE // 2)
-        self.snake = Snake(initial_position)
+    def __init__(self, render=True, food_positions=None, grid_size=GRID_SIZE, rng=None):
+        self.grid_size = grid_size
+        # Food comes from rng, a numpy Generator, when given and from the global random otherwise
+        self.rng = rng
+        initial_position = (grid_size // 2, grid_size // 2)
+        self.snake = Snake(initial_position, grid_size)
         self.food_positions = food_positions if food_positions is not None else []
         self.food_index = 0
         self.food = self.place_food()  # Place the first food 
@@ -23,15 +25,18 @@ class SnakeGame:
             return food_pos
         else:
             while True:
-                food_pos = (random.randint(0, GRID_SIZE - 1), random.randint(0, GRID_SIZE - 1))
-                if food_pos not in self.snake.body:
+                if self.rng is not None:
+                    food_pos = tuple(int(v) for v in self.rng.integers(0, self.grid_size, size=2))
+                else:
+                    food_pos = (random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1))
+                if not self.snake.occupies(food_pos):
                     self.food_positions.append(food_pos)
                     self.food_index += 1
                     return food_pos
 
     def update(self):
         if self.neural_network:
-            vision = self.snake.look(self.food, GRID_SIZE)
+            vision = self.snake.look(self.food, self.grid_size)
             prediction = self.neural_network.forward(np.array(vision).reshape(-1, 1))
             move = np.argmax(prediction)
             directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]  # Right, Left, Down, Up
@@ -47,7 +52,7 @@ class SnakeGame:
                 self.snake.set_direction(new_direction)
 
         self.snake.move()
-        if self.snake.check_collision(GRID_SIZE) or self.snake.moves <= 0:
+        if self.snake.check_collision(self.grid_size) or self.snake.moves <= 0:
             return False  # Game over
         
         if self.snake.body[0] == self.food:
@@ -59,14 +64,17 @@ class SnakeGame:
 
     def draw(self, screen):
         if self.render:
-            grid_width = SNAKE_SIZE * GRID_SIZE
-            grid_height = SNAKE_SIZE * GRID_SIZE
+            import pygame
+
+            cell_size = SCREEN_HEIGHT // self.grid_size
+            grid_width = cell_size * self.grid_size
+            grid_height = cell_size * self.grid_size
             game_x_offset = 300  # Offset for the game grid
             pygame.draw.rect(screen, WHITE, [game_x_offset, 0, grid_width, grid_height], 2)
 
             for segment in self.snake.body:
                 pygame.draw.rect(screen, WHITE, 
-                                (game_x_offset + segment[1] * SNAKE_SIZE, segment[0] * SNAKE_SIZE, SNAKE_SIZE, SNAKE_SIZE))
+                                (game_x_offset + segment[1] * cell_size, segment[0] * cell_size, cell_size, cell_size))
             
             pygame.draw.rect(screen, RED, 
-                            (game_x_offset + self.food[1] * SNAKE_SIZE, self.food[0] * SNAKE_SIZE, SNAKE_SIZE, SNAKE_SIZE))
\ No newline at end of file
+                            (game_x_offset + self.food[1] * cell_size, self.food[0] * cell_size, cell_size, cell_size))
\ No newline at end of file
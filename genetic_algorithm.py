@@ -1,10 +1,22 @@
 import logging
+import os
+import time
 import numpy as np
-import random
 from copy import deepcopy
 from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from parallel_eval import ParallelEvaluator, PER_NETWORK_STATS
+from racing import RacingEvaluator
+from selection import SELECTION_METHODS, select_parents
+from batch_env import BatchSnakeEnv, END_CYCLE, END_DOOMED
+from game import SnakeGame
+from constants import GRID_SIZE
+from fitness_cache import FitnessCache
+from seeding import SeedStreams
 import asyncio
 
+SEED_STRATEGIES = ('clone', 'mutate', 'mix')
+
 async def evaluate_network(network, game_class, games_per_network, render=False):
     total_score = 0
     for _ in range(games_per_network):
@@ -21,73 +33,276 @@ async def evaluate_network(network, game_class, games_per_network, render=False)
     avg_score = total_score / games_per_network if games_per_network else 1
     return avg_score
 
+def evaluate_population(networks, games_per_network=1, rng=None, record=False, cycle_detection=True, doomed_check=False,
+                        food_draws=None, grid_size=GRID_SIZE):
+    # Plays every network's games in one BatchSnakeEnv; same fitness as evaluate_network.
+    # Returns the mean fitness per network and a dict of evaluation stats which, with
+    # record, also holds the best game's fitness and GameRecording. With food_draws (see
+    # seeding.food_draws), game j of every network places its food from row j, so a
+    # network's fitness depends only on its genome; otherwise food comes from rng.
+    if not isinstance(networks, NetworkPopulation):
+        networks = NetworkPopulation.from_networks(networks)
+    env = BatchSnakeEnv(len(networks) * games_per_network, grid_size=grid_size, rng=rng, record=record,
+                        cycle_detection=cycle_detection, doomed_check=doomed_check, food_draws=food_draws)
+    moves = np.zeros((len(networks), games_per_network), dtype=np.int64)
+    simulate_seconds = inference_seconds = 0.0
+    while env.alive.any():
+        started = time.perf_counter()
+        # Only run networks that still have a game in progress
+        rows = np.flatnonzero(env.alive.reshape(len(networks), games_per_network).any(axis=1))
+        vision = env.observe().reshape(len(networks), games_per_network, -1)
+        observed = time.perf_counter()
+        moves[rows] = networks.forward_batch(vision[rows], rows)
+        decided = time.perf_counter()
+        env.step(moves.reshape(-1))
+        simulate_seconds += time.perf_counter() - decided + observed - started
+        inference_seconds += decided - observed
+    fitness = env.fitness()
+    stats = {
+        'ticks': env.ticks,
+        'ticks_skipped': env.ticks_skipped,
+        'cycles': int((env.early_end == END_CYCLE).sum()),
+        'doomed': int((env.early_end == END_DOOMED).sum()),
+        'games': env.num_games,
+        'lifetime': int(env.lifetimes.sum()),
+        'best_score': int(env.scores.max(initial=0)),
+        'simulate_seconds': simulate_seconds,
+        'inference_seconds': inference_seconds,
+        # Per network, in population order: its best score, total lifetime and games
+        'network_scores': env.scores.reshape(len(networks), games_per_network).max(axis=1),
+        'network_lifetimes': env.lifetimes.reshape(len(networks), games_per_network).sum(axis=1),
+        'network_games': np.full(len(networks), games_per_network),
+    }
+    if record:
+        best_game = int(np.argmax(fitness))
+        stats['best_fitness'] = fitness[best_game]
+        stats['best_recording'] = env.recording(best_game)
+    return fitness.reshape(len(networks), games_per_network).mean(axis=1), stats
+
 class GeneticAlgorithm:
-    def __init__(self, population_size=3000, mutation_rate=0.2, batch_size=100, elitism_rate=0.1, max_generations=5000):
+    def __init__(self, population_size=3000, mutation_rate=0.2, batch_size=100, elitism_rate=0.1, max_generations=5000,
+                 backend='serial', workers=None, selection='tournament', tournament_size=75, record_best=False,
+                 cycle_detection=True, doomed_check=False, eval_seed=None, cache_size=None, racing_eta=None,
+                 grid_size=GRID_SIZE, seed=None):
+        if selection not in SELECTION_METHODS:
+            raise ValueError(f"Unknown selection method {selection!r}, expected one of {tuple(SELECTION_METHODS)}")
         self.population_size = population_size
         self.mutation_rate = mutation_rate
         self.batch_size = batch_size
         self.elitism_rate = elitism_rate
-        self.population = [NeuralNetwork(hidden_layer_sizes=[32, 32]) for _ in range(population_size)]
+        # Every random draw of the GA comes from a stream keyed by generation and purpose
+        self.seeds = SeedStreams(seed)
+        layout = NetworkPopulation(0, hidden_layer_sizes=[32, 32])
+        self.population = layout.like(self.seeds.generator(0, 'population').standard_normal(
+            (population_size, layout.num_params), dtype=np.float32))
+        self.food_positions = []
         self.fitness_scores = []
+        self.fitness_history = []  # (best, mean) raw fitness of every evaluated generation
+        self.best_genome = None
+        # With record_best, the GameRecording of each generation's best game
+        self.record_best = record_best
+        self.best_recording = None
         self.generation = 0
         self.max_generations = max_generations
+        self.grid_size = grid_size
+        self.evaluator = ParallelEvaluator(backend, workers, cycle_detection=cycle_detection, doomed_check=doomed_check,
+                                           grid_size=grid_size)
+        if racing_eta is not None:
+            # Successive halving: only the most promising networks play all games_per_network games
+            self.evaluator = RacingEvaluator(self.evaluator, racing_eta)
+        self.evaluation_stats = {}  # ticks simulated and saved by early termination, last generation
+        self.raw_fitness = None  # fitness_scores of the last generation before normalisation
+        self.turnover_times = {}  # seconds spent in each step of the last create_new_generation
+        # With eval_seed every generation plays the same seeded food, which makes fitness a
+        # function of the genome alone; then elites and unchanged children are looked up in
+        # an LRU cache (cache_size entries, 0 to disable) instead of being played again.
+        # Racing makes fitness depend on the rest of the population, so it is never cached.
+        self.eval_seed = eval_seed
+        self.fitness_cache = None
+        if eval_seed is not None and cache_size != 0 and racing_eta is None:
+            self.fitness_cache = FitnessCache(cache_size or 2 * population_size)
+        self.selection = selection
+        self.tournament_size = tournament_size
+
+    @property
+    def population(self):
+        return self.networks
+
+    @population.setter
+    def population(self, networks):
+        if not isinstance(networks, NetworkPopulation):
+            networks = NetworkPopulation.from_networks(networks)
+        self.networks = networks
+        # The next generation is written into this spare genome matrix, then the two are swapped
+        self.next_networks = networks.like(np.empty(networks.genomes.shape, dtype=networks.genomes.dtype))
+        self.weight_layers, self.weight_columns = networks.weight_layout()
+
+    def best_network(self):
+        # Best network of the last evaluated generation, independent of the population
+        return self.networks.like(self.best_genome[None]).network(0)
+
+    def seed_population(self, model_paths, strategy='clone', noise_scale=0.1, fresh_fraction=0.5):
+        # Fills the population from saved models, parsing each file once. 'clone' copies them
+        # round-robin, 'mutate' adds weight noise to all but the first copy of each model and
+        # 'mix' does the same for part of the population and leaves fresh random genomes in the rest.
+        if strategy not in SEED_STRATEGIES:
+            raise ValueError(f"Unknown seeding strategy {strategy!r}, expected one of {SEED_STRATEGIES}")
+        if isinstance(model_paths, (str, os.PathLike)):
+            model_paths = [model_paths]
+
+        models = []
+        for path in model_paths:
+            network = NeuralNetwork()
+            network.load(path)
+            if [w.shape for w in network.weights] != self.networks.weight_shapes:
+                raise ValueError(f"{path} does not match the population's layer sizes {self.networks.layer_sizes}")
+            models.append(network)
+        sources = NetworkPopulation.from_networks(models).genomes
+
+        genomes = self.networks.genomes
+        rng = self.seeds.generator(self.generation, 'population', 1)
+        num_fresh = int(fresh_fraction * self.population_size) if strategy == 'mix' else 0
+        num_seeded = self.population_size - num_fresh
+        genomes[:num_seeded] = sources[np.arange(num_seeded) % len(sources)]
+        if strategy != 'clone':
+            noise_shape = (max(num_seeded - len(sources), 0), self.networks.num_weights)
+            genomes[len(sources):num_seeded, :self.networks.num_weights] += \
+                (rng.standard_normal(noise_shape) * noise_scale).astype(np.float32)
+        genomes[num_seeded:] = rng.standard_normal((num_fresh, self.networks.num_params))
+        self.fitness_scores = []
 
     def generate_food_positions(self, num_positions, grid_size):
-        self.food_positions.clear()
-        for _ in range(num_positions):
-            while True:
-                food_pos = (random.randint(0, grid_size - 1), random.randint(0, grid_size - 1))
-                if food_pos not in self.food_positions:
-                    self.food_positions.append(food_pos)
-                    break
+        # Distinct cells for this generation, drawn in one go from its own stream
+        rng = self.seeds.generator(self.generation, 'food_positions')
+        cells = rng.choice(grid_size * grid_size, size=num_positions, replace=False)
+        self.food_positions = [(int(cell) // grid_size, int(cell) % grid_size) for cell in cells]
+        return self.food_positions
+
+    def food_seed(self):
+        # Every network of a generation plays the same food; with eval_seed every generation does
+        return self.eval_seed if self.eval_seed is not None else self.seeds.food_seed(self.generation)
 
     async def evaluate_fitness(self, game_class, games_per_network=1):
-        self.fitness_scores = []
-        batches = [self.population[i:i + self.batch_size] for i in range(0, self.population_size, self.batch_size)]
-        for batch in batches:
-            tasks = [asyncio.create_task(evaluate_network(network, game_class, games_per_network, render=False)) for network in batch]
-            results = await asyncio.gather(*tasks)
-            self.fitness_scores.extend(results)
-        self.fitness_scores = np.array(self.fitness_scores)
+        if game_class is SnakeGame and self.fitness_cache is not None:
+            self.fitness_scores = self.evaluate_cached(games_per_network)
+        elif game_class is SnakeGame:
+            self.fitness_scores, self.evaluation_stats = self.evaluator.evaluate(self.networks, games_per_network,
+                                                                                 self.record_best, self.food_seed())
+            self.best_recording = self.evaluation_stats.pop('best_recording', None)
+            for key in PER_NETWORK_STATS:
+                self.evaluation_stats.pop(key, None)
+        else:
+            self.fitness_scores = []
+            batches = [self.population[i:i + self.batch_size] for i in range(0, self.population_size, self.batch_size)]
+            for batch in batches:
+                tasks = [asyncio.create_task(evaluate_network(network, game_class, games_per_network, render=False)) for network in batch]
+                results = await asyncio.gather(*tasks)
+                self.fitness_scores.extend(results)
+            self.fitness_scores = np.array(self.fitness_scores)
+        self.raw_fitness = self.fitness_scores
+        self.fitness_history.append((float(np.max(self.fitness_scores)), float(np.mean(self.fitness_scores))))
+        # Copied, as create_new_generation reuses this genome matrix two generations later
+        self.best_genome = self.networks.genomes[np.argmax(self.fitness_scores)].copy()
         if np.sum(self.fitness_scores) > 0:
             self.fitness_scores = self.fitness_scores / np.sum(self.fitness_scores)
         else:
             logging.warning("Sum of fitness scores is zero or negative. Check fitness calculation.")
 
-    def tournament_selection(self, tournament_size=75):  # Increased tournament size
-        tournament = random.sample(list(zip(self.population, self.fitness_scores)), tournament_size)
-        best_individual = max(tournament, key=lambda x: x[1])[0]
-        return best_individual
+    def evaluate_cached(self, games_per_network):
+        # Plays only genomes the cache has not seen, and each of those once even if the
+        # population holds several copies of it
+        genomes = self.networks.genomes
+        keys = FitnessCache.genome_keys(genomes, self.eval_seed, games_per_network, self.grid_size)
+        fitness = np.empty(len(keys))
+        scores, lifetimes, games = (np.zeros(len(keys), dtype=np.int64) for _ in range(3))
+        pending = {}
+        duplicates = 0
+        for row, key in enumerate(keys):
+            if key in pending:
+                pending[key].append(row)
+                duplicates += 1
+                continue
+            cached = self.fitness_cache.get(key)
+            if cached is None:
+                pending[key] = [row]
+            else:
+                fitness[row], scores[row], lifetimes[row], games[row] = cached
 
+        # Ticks and timings count only the games simulated now; games, lifetime and best
+        # score cover the whole population, cached or not
+        stats = {'ticks': 0, 'ticks_skipped': 0, 'cycles': 0, 'doomed': 0, 'simulate_seconds': 0.0,
+                 'inference_seconds': 0.0}
+        if pending:
+            played = np.array([rows[0] for rows in pending.values()])
+            results, stats = self.evaluator.evaluate(self.networks.like(genomes[played]), games_per_network,
+                                                     self.record_best, self.eval_seed)
+            per_network = zip(results, stats['network_scores'], stats['network_lifetimes'], stats['network_games'])
+            for (key, rows), result in zip(pending.items(), per_network):
+                fitness[rows], scores[rows], lifetimes[rows], games[rows] = result
+                self.fitness_cache.put(key, result)
+        for key in PER_NETWORK_STATS:
+            stats.pop(key, None)
+        stats.update(games=int(games.sum()), lifetime=int(lifetimes.sum()), best_score=int(scores.max(initial=0)))
 
-    def crossover(self, parent1, parent2):
-        child1, child2 = deepcopy(parent1), deepcopy(parent2)
-        for i in range(len(parent1.weights)):
-            crossover_point = random.randint(0, parent1.weights[i].shape[1] - 1)
-            child1.weights[i][:, :crossover_point], child2.weights[i][:, :crossover_point] = \
-                deepcopy(parent2.weights[i][:, :crossover_point]), deepcopy(parent1.weights[i][:, :crossover_point])
-        return child1, child2
+        if self.record_best:
+            best = int(np.argmax(fitness))
+            if any(best in rows for rows in pending.values()):
+                self.best_recording = stats['best_recording']
+            else:
+                # The best genome came from the cache: replay its games to record them
+                _, best_stats = self.evaluator.evaluate(self.networks.like(genomes[best:best + 1]), games_per_network,
+                                                        True, self.eval_seed)
+                self.best_recording = best_stats['best_recording']
+        stats.pop('best_recording', None)
+        stats.pop('best_fitness', None)
+        stats['cache'] = dict(self.fitness_cache.stats(), duplicates=duplicates)
+        self.evaluation_stats = stats
+        return fitness
 
-    def mutate(self, network):
-        for i in range(len(network.weights)):
-            if random.random() < self.mutation_rate:
-                noise = np.random.randn(*network.weights[i].shape) * 0.1
-                network.weights[i] += noise
+    def select_parents(self, num_parents):
+        kwargs = {'tournament_size': self.tournament_size} if self.selection == 'tournament' else {}
+        rng = self.seeds.generator(self.generation, 'selection')
+        return select_parents(self.fitness_scores, num_parents, self.selection, rng=rng, **kwargs)
 
-        return network
+    def crossover(self, parents1, parents2, children1, children2):
+        # For every pair and layer, weight columns left of a random crossover point come
+        # from the other parent. Biases are inherited from the child's own parent.
+        genomes = self.networks.genomes
+        num_weights = self.networks.num_weights
+        rng = self.seeds.generator(self.generation, 'crossover')
+        points = np.column_stack([rng.integers(0, x, size=len(parents1)) for _, x in self.networks.weight_shapes])
+        swap = self.weight_columns < points[:, self.weight_layers]
+        np.take(genomes, parents1, axis=0, out=children1)
+        np.copyto(children1[:, :num_weights], genomes[parents2, :num_weights], where=swap)
+        parents1, parents2, swap = parents1[:len(children2)], parents2[:len(children2)], swap[:len(children2)]
+        np.take(genomes, parents2, axis=0, out=children2)
+        np.copyto(children2[:, :num_weights], genomes[parents1, :num_weights], where=swap)
+
+    def mutate(self, genomes):
+        # Each layer of each genome gets Gaussian weight noise with probability mutation_rate
+        rng = self.seeds.generator(self.generation, 'mutation')
+        for start, end in self.networks.weight_slices:
+            rows = np.flatnonzero(rng.random(len(genomes)) < self.mutation_rate)
+            genomes[rows, start:end] += rng.standard_normal((len(rows), end - start), dtype=np.float32) * np.float32(0.1)
+        return genomes
 
     def create_new_generation(self):
-        new_population = []
+        started = time.perf_counter()
         num_elites = int(self.elitism_rate * self.population_size)
-        elite_indices = np.argsort(self.fitness_scores)[-num_elites:]
-        elites = [self.population[i] for i in elite_indices]
-        new_population.extend(elites)
-        while len(new_population) < self.population_size:
-            parent1 = self.tournament_selection()
-            parent2 = self.tournament_selection()
-            child1, child2 = self.crossover(parent1, parent2)
-            new_population.append(self.mutate(child1))
-            if len(new_population) < self.population_size:
-                new_population.append(self.mutate(child2))
-        self.population = new_population[:self.population_size]
-        self.generation += 1
\ No newline at end of file
+        elite_indices = np.argsort(self.fitness_scores)[self.population_size - num_elites:]
+        next_genomes = self.next_networks.genomes
+        np.take(self.networks.genomes, elite_indices, axis=0, out=next_genomes[:num_elites])
+        elites_done = time.perf_counter()
+
+        children = next_genomes[num_elites:]
+        num_pairs = (len(children) + 1) // 2
+        parents = self.select_parents(2 * num_pairs).reshape(-1, 2)
+        selected = time.perf_counter()
+        self.crossover(parents[:, 0], parents[:, 1], children[0::2], children[1::2])
+        crossed = time.perf_counter()
+        self.mutate(children)
+
+        self.networks, self.next_networks = self.next_networks, self.networks
+        self.generation += 1
+        self.turnover_times = {'elitism': elites_done - started, 'selection': selected - elites_done,
+                               'crossover': crossed - selected, 'mutation': time.perf_counter() - crossed}
@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+import numpy as np
+from constants import GRID_SIZE, SAVE_DIR
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from recording import DIRECTIONS
+
+# Serves saved models to many concurrent games: python -m inference_server --help.
+# Requests and replies are JSON lines over a Unix or TCP socket, and one connection
+# may have any number of requests in flight; replies carry the request's id:
+#   {"id": 1, "model": "game3_progress.json", "observation": [24 floats]} -> {"id": 1, "move": 2}
+#   {"id": 2, "stats": true} -> {"id": 2, "stats": {...}}
+# Requests for the same model that arrive within the batching window are answered
+# with one batched forward pass.
+
+class ModelCache:
+    """LRU cache of loaded models, keyed by their path relative to model_dir.
+
+    A model file that changed on disk since it was loaded, such as a progress file
+    that training keeps overwriting, is loaded again.
+    """
+
+    def __init__(self, model_dir=SAVE_DIR, max_models=8):
+        if max_models < 1:
+            raise ValueError(f"Model cache needs room for at least one model, got {max_models}")
+        self.model_dir = os.path.realpath(model_dir)
+        self.max_models = max_models
+        self.models = OrderedDict()  # path -> (modification time, single-network NetworkPopulation)
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def path(self, name):
+        path = os.path.realpath(os.path.join(self.model_dir, name))
+        if os.path.commonpath([path, self.model_dir]) != self.model_dir:
+            raise ValueError(f"Model {name!r} is outside the model directory")
+        return path
+
+    def get(self, name):
+        path = self.path(name)
+        modified = os.stat(path).st_mtime_ns
+        cached = self.models.get(path)
+        if cached is not None and cached[0] == modified:
+            self.models.move_to_end(path)
+            self.hits += 1
+            return cached[1]
+
+        population = NetworkPopulation.from_networks([NeuralNetwork().load(path)])
+        self.loads += 1
+        self.models[path] = (modified, population)
+        self.models.move_to_end(path)
+        while len(self.models) > self.max_models:
+            self.models.popitem(last=False)
+            self.evictions += 1
+        return population
+
+    def stats(self):
+        return {'models': len(self.models), 'hits': self.hits, 'loads': self.loads, 'evictions': self.evictions}
+
+def latency_summary(latencies):
+    if not latencies:
+        return {'p50_ms': 0.0, 'p99_ms': 0.0}
+    p50, p99 = np.percentile(np.fromiter(latencies, dtype=np.float64), [50, 99]) * 1000
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+class MicroBatcher:
+    """Gathers observations per model for up to window seconds, then runs each model once.
+
+    The window opens with the first request after a flush. A model whose queue reaches
+    max_batch_size is run straight away without waiting for the window to close.
+    """
+
+    def __init__(self, cache, window=0.002, max_batch_size=256):
+        self.cache = cache
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.pending = {}  # model name -> [(observation, future)]
+        self.flush_handle = None
+        self.latencies = deque(maxlen=100000)  # seconds from arrival to answer, newest requests
+        self.requests = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    async def predict(self, model, observation):
+        arrived = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        queue = self.pending.setdefault(model, [])
+        queue.append((observation, future))
+        if len(queue) >= self.max_batch_size:
+            self.run_batch(model)
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+        move = await future
+        self.latencies.append(time.perf_counter() - arrived)
+        self.requests += 1
+        return move
+
+    def flush(self):
+        self.flush_handle = None
+        for model in list(self.pending):
+            try:
+                self.run_batch(model)
+            except Exception as error:
+                # Whatever went wrong with one model, the others still get their batch
+                self.fail(self.pending.pop(model, []), ValueError(f"Batch for model {model!r} failed: {error}"))
+
+    def run_batch(self, model):
+        queue = self.pending.pop(model)
+        try:
+            population = self.cache.get(model)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            self.fail(queue, ValueError(f"Cannot load model {model!r}: {error}"))
+            return
+
+        inputs = population.layer_sizes[0]
+        valid = []
+        for observation, future in queue:
+            if len(observation) == inputs:
+                valid.append((observation, future))
+            elif not future.done():
+                future.set_exception(ValueError(f"Expected {inputs} observation values, got {len(observation)}"))
+        if not valid:
+            return
+        try:
+            moves = population.forward_batch(np.stack([observation for observation, _ in valid])[None])[0]
+        except Exception as error:
+            self.fail(valid, ValueError(f"Cannot run model {model!r}: {error}"))
+            return
+        self.batches += 1
+        for (_, future), move in zip(valid, moves):
+            # A future is already done when its client went away mid-batch
+            if not future.done():
+                future.set_result(int(move))
+
+    @staticmethod
+    def fail(queue, error):
+        for _, future in queue:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return dict(latency_summary(self.latencies), requests=self.requests, batches=self.batches,
+                    mean_batch_size=self.requests / self.batches if self.batches else 0.0,
+                    throughput=self.requests / elapsed if elapsed else 0.0, cache=self.cache.stats())
+
+class InferenceServer:
+    """Answers JSON-line move requests from any number of connections through one MicroBatcher."""
+
+    def __init__(self, model_dir=SAVE_DIR, cache_size=8, window=0.002, max_batch_size=256):
+        self.batcher = MicroBatcher(ModelCache(model_dir, cache_size), window, max_batch_size)
+
+    async def handle(self, reader, writer):
+        answers = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                answer = asyncio.create_task(self.answer(line, writer))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+            if answers:
+                await asyncio.gather(*answers)
+        finally:
+            writer.close()
+
+    async def answer(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('stats'):
+                reply = {'id': request_id, 'stats': self.batcher.stats()}
+            else:
+                observation = np.asarray(request['observation'], dtype=np.float32)
+                if observation.ndim != 1:
+                    raise ValueError("An observation is a flat list of numbers")
+                move = await self.batcher.predict(request['model'], observation)
+                reply = {'id': request_id, 'move': move}
+        except KeyError as error:
+            reply = {'id': request_id, 'error': f"Request is missing {error}"}
+        except (ValueError, TypeError, AttributeError) as error:
+            reply = {'id': request_id, 'error': str(error)}
+        if not writer.is_closing():
+            writer.write((json.dumps(reply) + '\n').encode())
+
+    async def serve(self, unix_path=None, host='127.0.0.1', port=8765, report_interval=10.0):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving models from {self.batcher.cache.model_dir} on {unix_path or f'{host}:{port}'}")
+        async with server:
+            while True:
+                await asyncio.sleep(report_interval)
+                print(format_stats(self.batcher.stats()), flush=True)
+
+def format_stats(stats):
+    return (f"{stats['requests']} requests, {stats['throughput']:.0f}/s since start, p50 {stats['p50_ms']:.2f}ms, "
+            f"p99 {stats['p99_ms']:.2f}ms, mean batch {stats['mean_batch_size']:.1f}, "
+            f"{stats['cache']['models']} models cached")
+
+class InferenceClient:
+    """One connection to an InferenceServer; concurrent predict() calls share it."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}  # request id -> future
+        self.next_id = 0
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, unix_path=None, host='127.0.0.1', port=8765):
+        if unix_path is not None:
+            return cls(*await asyncio.open_unix_connection(unix_path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.waiting.pop(reply['id'], None)
+            if future is None or future.done():
+                continue
+            if 'error' in reply:
+                future.set_exception(ValueError(reply['error']))
+            else:
+                future.set_result(reply.get('move', reply.get('stats')))
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Inference server closed the connection"))
+
+    async def request(self, **fields):
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_id] = future
+        self.writer.write((json.dumps(dict(fields, id=self.next_id)) + '\n').encode())
+        return await future
+
+    async def predict(self, model, observation):
+        return await self.request(model=model, observation=[float(v) for v in observation])
+
+    async def stats(self):
+        return await self.request(stats=True)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+async def play_remote(client, model, grid_size, latencies):
+    # One SnakeGame whose every move comes from the server; same rules as SnakeGame.update
+    from game import SnakeGame
+
+    game = SnakeGame(render=False, grid_size=grid_size)
+    while True:
+        started = time.perf_counter()
+        move = await client.predict(model, game.snake.look(game.food))
+        latencies.append(time.perf_counter() - started)
+        dx, dy = DIRECTIONS[move]
+        if game.snake.direction != (-dx, -dy):
+            game.snake.set_direction((dx, dy))
+        if not game.update():
+            return game.score
+
+async def bench(args):
+    # --games concurrent games over --connections connections, as a demo wall would run them
+    clients = [await InferenceClient.connect(args.unix, args.host, args.port) for _ in range(args.connections)]
+    latencies = []
+    started = time.perf_counter()
+    scores = await asyncio.gather(*(play_remote(clients[game % len(clients)], args.model, args.grid_size, latencies)
+                                    for game in range(args.games)))
+    elapsed = time.perf_counter() - started
+    summary = latency_summary(latencies)
+    print(f"{args.games} games, {len(latencies)} moves in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} moves/s), "
+          f"client p50 {summary['p50_ms']:.2f}ms, p99 {summary['p99_ms']:.2f}ms, best score {max(scores)}")
+    print("Server:", format_stats(await clients[0].stats()))
+    for client in clients:
+        await client.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m inference_server",
+                                     description="Serve saved snake models with micro-batched inference.")
+    parser.add_argument("command", choices=("serve", "bench"))
+    parser.add_argument("--unix", default=None, help="Unix socket path; TCP on --host/--port otherwise")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-dir", default=SAVE_DIR, help="models are named relative to this directory")
+    parser.add_argument("--cache-size", type=int, default=8, help="loaded models kept in memory")
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="how long the first request of a batch waits for others")
+    parser.add_argument("--max-batch", type=int, default=256, help="run a model at once when this many requests wait")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds between server stats lines")
+    parser.add_argument("--model", help="bench: model to play, relative to the server's model directory")
+    parser.add_argument("--games", type=int, default=100, help="bench: concurrent games")
+    parser.add_argument("--connections", type=int, default=4, help="bench: connections the games share")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE, help="bench: board size of the games")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'bench':
+        if args.model is None:
+            raise ValueError("bench needs --model")
+        asyncio.run(bench(args))
+        return 0
+    server = InferenceServer(args.model_dir, args.cache_size, args.window_ms / 1000, args.max_batch)
+    try:
+        asyncio.run(server.serve(args.unix, args.host, args.port, args.report_interval))
+    except KeyboardInterrupt:
+        print(format_stats(server.batcher.stats()))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
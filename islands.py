@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import random
+import secrets
+import threading
+from multiprocessing.connection import Client, Listener, wait
+import numpy as np
+
+TOPOLOGIES = ('ring', 'full')
+TRANSPORTS = ('pipe', 'socket')
+
+def migration_targets(topology, island, num_islands):
+    if topology == 'ring':
+        return [(island + 1) % num_islands] if num_islands > 1 else []
+    return [other for other in range(num_islands) if other != island]
+
+def migration_sources(topology, island, num_islands):
+    return [source for source in range(num_islands) if island in migration_targets(topology, source, num_islands)]
+
+def _connect_sockets(island, listener, addresses, targets, sources, authkey):
+    # Accepting runs on a thread, as every island connects out while others connect in.
+    # Each connection starts with the sender's island number.
+    inbound = {}
+
+    def accept():
+        for _ in sources:
+            connection = listener.accept()
+            inbound[connection.recv()] = connection
+
+    acceptor = threading.Thread(target=accept)
+    acceptor.start()
+    outbound = {}
+    for target in targets:
+        outbound[target] = Client(addresses[target], authkey=authkey)
+        outbound[target].send(island)
+    acceptor.join()
+    listener.close()
+    return outbound, inbound
+
+def _exchange(outbound, inbound, migrants):
+    # Sends on threads so two islands sending to each other cannot both block on a full pipe
+    senders = [threading.Thread(target=connection.send, args=(migrants,)) for connection in outbound.values()]
+    for sender in senders:
+        sender.start()
+    received = [connection.recv() for connection in inbound.values()]
+    for sender in senders:
+        sender.join()
+    return received
+
+def run_island(island, num_islands, topology, transport, ga_options, generations, migration_interval,
+               num_migrants, games_per_network, seed, control, outbound=None, inbound=None, authkey=None):
+    # Runs in its own process: an ordinary GeneticAlgorithm that, every migration_interval
+    # generations, sends copies of its best genomes to its targets and puts the ones it
+    # receives in place of its last children. Progress goes back over control.
+    from genetic_algorithm import GeneticAlgorithm
+    from game import SnakeGame
+
+    random.seed(seed)
+    np.random.seed(seed)
+    if transport == 'socket':
+        listener = Listener(('localhost', 0), authkey=authkey)
+        control.send(listener.address)
+        addresses = control.recv()
+        outbound, inbound = _connect_sockets(island, listener, addresses,
+                                             migration_targets(topology, island, num_islands),
+                                             migration_sources(topology, island, num_islands), authkey)
+
+    gen_alg = GeneticAlgorithm(**dict(ga_options, seed=seed))
+    best_fitness, best_genome = float('-inf'), None  # over the whole run, not just the last generation
+    for generation in range(generations):
+        asyncio.run(gen_alg.evaluate_fitness(SnakeGame, games_per_network))
+        best, mean = gen_alg.fitness_history[-1]
+        if best > best_fitness:
+            best_fitness, best_genome = best, gen_alg.best_genome
+        migrate = (generation + 1) % migration_interval == 0 and (outbound or inbound)
+        if migrate:
+            best_rows = np.argsort(gen_alg.raw_fitness)[-num_migrants:]
+            migrants = gen_alg.networks.genomes[best_rows].copy()
+        gen_alg.create_new_generation()
+        if migrate:
+            received = _exchange(outbound, inbound, migrants)
+            if received:
+                incoming = np.concatenate(received)[:gen_alg.population_size]
+                gen_alg.networks.genomes[len(gen_alg.networks.genomes) - len(incoming):] = incoming
+        control.send(('generation', island, generation + 1, best, mean, gen_alg.evaluation_stats.get('ticks', 0)))
+
+    control.send(('done', island, best_genome, best_fitness))
+    for connection in list((outbound or {}).values()) + list((inbound or {}).values()):
+        connection.close()
+
+class IslandModel:
+    """Runs independent GeneticAlgorithm islands in separate processes with migration.
+
+    Islands only ever talk through multiprocessing connections, which are the same
+    objects over a pipe or a socket, so spreading islands over several machines only
+    changes how the connections are made, not the GA.
+    """
+
+    def __init__(self, num_islands=4, topology='ring', migration_interval=10, num_migrants=5, transport='pipe',
+                 **ga_options):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown migration topology {topology!r}, expected one of {TOPOLOGIES}")
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown island transport {transport!r}, expected one of {TRANSPORTS}")
+        self.num_islands = num_islands
+        self.topology = topology
+        self.migration_interval = migration_interval
+        self.num_migrants = num_migrants
+        self.transport = transport
+        # Passed to every island's GeneticAlgorithm; population_size is per island
+        self.ga_options = ga_options
+        self.history = []  # (island, generation, best, mean, ticks) as islands report them
+        self.best_genome = None
+        self.best_fitness = None
+
+    def _pipes(self):
+        # One one-way pipe per migration edge
+        outbound = [{} for _ in range(self.num_islands)]
+        inbound = [{} for _ in range(self.num_islands)]
+        for source in range(self.num_islands):
+            for target in migration_targets(self.topology, source, self.num_islands):
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                outbound[source][target] = sender
+                inbound[target][source] = receiver
+        return outbound, inbound
+
+    def run(self, generations, games_per_network=1, seed=None, report=None):
+        # report(generation, best, mean, ticks) is called once every island finished a generation
+        seeds = np.random.SeedSequence(seed).generate_state(self.num_islands)
+        controls, processes = [], []
+        ga_options = dict(self.ga_options, backend='serial')
+        authkey = None
+        if self.transport == 'socket':
+            authkey = secrets.token_bytes(16)
+            edges = [None] * self.num_islands, [None] * self.num_islands
+        else:
+            edges = self._pipes()
+        for island in range(self.num_islands):
+            parent_end, child_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_island, daemon=True,
+                args=(island, self.num_islands, self.topology, self.transport, dict(ga_options), generations,
+                      self.migration_interval, self.num_migrants, games_per_network, int(seeds[island]), child_end,
+                      edges[0][island], edges[1][island], authkey))
+            process.start()
+            controls.append(parent_end)
+            processes.append(process)
+
+        if self.transport == 'socket':
+            addresses = [control.recv() for control in controls]
+            for control in controls:
+                control.send(addresses)
+
+        pending = {}
+        best = []
+        running = list(controls)
+        while running:
+            for control in wait(running):
+                message = control.recv()
+                if message[0] == 'done':
+                    best.append(message[1:])
+                    running.remove(control)
+                    continue
+                _, island, generation, best_fitness, mean_fitness, ticks = message
+                self.history.append((island, generation, best_fitness, mean_fitness, ticks))
+                reports = pending.setdefault(generation, [])
+                reports.append((best_fitness, mean_fitness, ticks))
+                if len(reports) == self.num_islands:
+                    del pending[generation]
+                    if report is not None:
+                        report(generation, max(r[0] for r in reports), np.mean([r[1] for r in reports]),
+                               sum(r[2] for r in reports))
+        for process in processes:
+            process.join()
+
+        _, self.best_genome, self.best_fitness = max(best, key=lambda result: result[2])
+        return self.best_fitness
+
+    def best_network(self):
+        from population import NetworkPopulation
+
+        return NetworkPopulation(1, genomes=self.best_genome[None]).network(0)
@@ -0,0 +1,110 @@
+import multiprocessing
+import queue
+import numpy as np
+from constants import GRID_SIZE
+
+MUTATION_RATE_STEP = 0.05
+
+def _latest(inbox, current):
+    # Drains the inbox and keeps only the newest message
+    while True:
+        try:
+            current = inbox.get_nowait()
+        except queue.Empty:
+            return current
+
+def run_viewer(inbox, outbox, fps=15):
+    # Runs in its own process: plays the newest genome it has been sent, one game at a
+    # time, and reports mutation-rate button clicks back to the trainer. F toggles
+    # fast-forward, which drops the frame limit.
+    import pygame
+    from constants import SCREEN_WIDTH, SCREEN_HEIGHT
+    from game import SnakeGame
+    from population import NetworkPopulation
+    from visualization import Renderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Snake AI Evolution')
+    increase_mut_button = pygame.Rect(10, 170, 50, 30)
+    decrease_mut_button = pygame.Rect(70, 170, 50, 30)
+    clock = pygame.time.Clock()
+    renderer = None
+    fast_forward = False
+
+    message, game, network = None, None, None
+    highscore = 0
+    mutation_rate = 0.0
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                fast_forward = not fast_forward
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if increase_mut_button.collidepoint(event.pos):
+                    mutation_rate = min(mutation_rate + MUTATION_RATE_STEP, 1.0)
+                    outbox.put(('mutation_rate', MUTATION_RATE_STEP))
+                elif decrease_mut_button.collidepoint(event.pos):
+                    mutation_rate = max(mutation_rate - MUTATION_RATE_STEP, 0.0)
+                    outbox.put(('mutation_rate', -MUTATION_RATE_STEP))
+
+        if game is None:
+            newest = _latest(inbox, None)
+            if newest is not None:
+                message = newest
+                genome, layer_sizes, _, mutation_rate, grid_size = message
+                population = NetworkPopulation(1, layer_sizes[0], layer_sizes[1:-1], layer_sizes[-1], genome[None])
+                network = population.network(0)
+                game = SnakeGame(grid_size=grid_size)
+                if renderer is None or renderer.grid_size != grid_size:
+                    renderer = Renderer(screen, grid_size=grid_size)
+                game.neural_network = network
+
+        if game is not None:
+            if not game.update():
+                game = None
+            else:
+                highscore = max(highscore, game.score)
+                renderer.draw(game, network, message[2], game.score, highscore, mutation_rate)
+        clock.tick(0 if fast_forward else fps)
+
+    pygame.quit()
+
+class LiveViewer:
+    """Shows the best snake of the latest generation without ever blocking training."""
+
+    def __init__(self, fps=15):
+        self.inbox = multiprocessing.Queue(maxsize=2)
+        self.outbox = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=run_viewer, args=(self.inbox, self.outbox, fps), daemon=True)
+        self.process.start()
+
+    def publish(self, network, generation, mutation_rate, grid_size=GRID_SIZE):
+        # When the viewer is behind, the oldest waiting genome is dropped to make room;
+        # the viewer itself only ever plays the newest one it finds.
+        genome = np.concatenate([w.ravel() for w in network.weights] + [b.ravel() for b in network.biases])
+        message = (genome.astype(np.float32), network.layer_sizes, generation, mutation_rate, grid_size)
+        try:
+            self.inbox.put_nowait(message)
+        except queue.Full:
+            try:
+                self.inbox.get_nowait()
+                self.inbox.put_nowait(message)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def apply_controls(self, gen_alg):
+        while True:
+            try:
+                kind, value = self.outbox.get_nowait()
+            except queue.Empty:
+                return
+            if kind == 'mutation_rate':
+                gen_alg.mutation_rate = min(max(gen_alg.mutation_rate + value, 0.0), 1.0)
+
+    def close(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
@@ -1,14 +1,20 @@
 import numpy as np
 import json
+from utils import write_atomic
 
 def relu(x):
     return np.maximum(0, x)
 
 class NeuralNetwork:
-    def __init__(self, input_size=24, hidden_layer_sizes=[32, 32], output_size=4):
+    def __init__(self, input_size=24, hidden_layer_sizes=[32, 32], output_size=4, weights=None, biases=None):
         self.layer_sizes = [input_size] + hidden_layer_sizes + [output_size]
-        self.weights = [np.random.randn(y, x) for x, y in zip(self.layer_sizes[:-1], self.layer_sizes[1:])]
-        self.biases = [np.random.randn(y, 1) for y in self.layer_sizes[1:]]
+        # weights/biases may be views onto one row of a NetworkPopulation
+        if weights is None:
+            weights = [np.random.randn(y, x) for x, y in zip(self.layer_sizes[:-1], self.layer_sizes[1:])]
+        if biases is None:
+            biases = [np.random.randn(y, 1) for y in self.layer_sizes[1:]]
+        self.weights = weights
+        self.biases = biases
 
     def forward(self, x):
         activation = x
@@ -21,16 +27,100 @@ class NeuralNetwork:
         output = self.forward(x)
         return np.argmax(output)
 
+    def compile(self, precision='float32'):
+        return CompiledNetwork(self, precision)
+
     def save(self, filename):
         model_data = {
             'weights': [w.tolist() for w in self.weights],
             'biases': [b.tolist() for b in self.biases]
         }
-        with open(filename, 'w') as f:
-            json.dump(model_data, f)
+        return write_atomic(filename, [json.dumps(model_data).encode()])
 
     def load(self, filename):
         with open(filename, 'r') as f:
             model_data = json.load(f)
         self.weights = [np.array(w) for w in model_data['weights']]
-        self.biases = [np.array(b) for b in model_data['biases']]
\ No newline at end of file
+        self.biases = [np.array(b) for b in model_data['biases']]
+        # The file decides the architecture, whatever this network was built with
+        self.layer_sizes = [self.weights[0].shape[1]] + [w.shape[0] for w in self.weights]
+        return self
+
+PRECISIONS = ('float32', 'int8')
+
+class CompiledNetwork:
+    """Inference-only copy of a NeuralNetwork in contiguous float32 or int8 buffers.
+
+    Each layer's bias is folded into its weight matrix as an extra column that meets a
+    constant 1 at the end of the layer's input buffer, so a layer is one dot and one
+    ReLU. All buffers are allocated at compile time and forward() and predict()
+    create no arrays. int8 weights are quantized per output row with a float32 scale
+    and dequantized layer by layer into a scratch matrix. The weights are a snapshot:
+    recompile after changing the network.
+    """
+
+    def __init__(self, network, precision='float32'):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown inference precision {precision!r}, expected one of {PRECISIONS}")
+        self.precision = precision
+        self.layer_sizes = list(network.layer_sizes)
+        self.weights, self.scales, self.dequantized = [], [], []
+        for w, b in zip(network.weights, network.biases):
+            fused = np.hstack([np.asarray(w, dtype=np.float64), np.reshape(b, (-1, 1))]).astype(np.float32)
+            if precision == 'int8':
+                # Only the weights are quantized; the bias column of the scratch matrix
+                # keeps its float32 value and is never overwritten
+                w = np.asarray(w, dtype=np.float64)
+                scale = np.abs(w).max(axis=1) / 127
+                scale[scale == 0] = 1
+                self.weights.append(np.ascontiguousarray(np.rint(w / scale[:, None]), dtype=np.int8))
+                self.scales.append(scale.astype(np.float32)[:, None])
+                self.dequantized.append(fused)
+            else:
+                self.weights.append(fused)
+
+        # Layer inputs end in the constant 1; each layer writes the next one's leading values
+        self.inputs = [np.ones(size + 1, dtype=np.float32) for size in self.layer_sizes[:-1]]
+        self.output = np.empty(self.layer_sizes[-1], dtype=np.float32)
+        self.outputs = [values[:-1] for values in self.inputs[1:]] + [self.output]
+        self.input = self.inputs[0][:-1]
+        self.dequantized_weights = [a[:, :-1] for a in self.dequantized]
+
+    @property
+    def nbytes(self):
+        # Parameter memory, counting int8 biases as the float32 column they live in; the
+        # rest of the buffers are scratch_nbytes
+        if self.dequantized:
+            return sum(a.nbytes + scale.nbytes + 4 * len(a) for a, scale in zip(self.weights, self.scales))
+        return sum(a.nbytes for a in self.weights)
+
+    @property
+    def scratch_nbytes(self):
+        return (sum(a.nbytes for a in self.inputs) + self.output.nbytes
+                + sum(a.nbytes - 4 * len(a) for a in self.dequantized))
+
+    def logits(self, x):
+        # Last layer before its ReLU, in a buffer the next call overwrites
+        np.copyto(self.input, np.reshape(x, -1), casting='same_kind')
+        last = len(self.weights) - 1
+        for l, (w, values, out) in enumerate(zip(self.weights, self.inputs, self.outputs)):
+            if self.dequantized:
+                np.multiply(w, self.scales[l], out=self.dequantized_weights[l])
+                w = self.dequantized[l]
+            np.dot(w, values, out=out)
+            if l < last:
+                np.maximum(out, 0, out=out)
+        return self.output
+
+    def forward(self, x):
+        # NeuralNetwork.forward as a flat vector, in a buffer the next call overwrites
+        output = self.logits(x)
+        np.maximum(output, 0, out=output)
+        return output
+
+    def predict(self, x):
+        # argmax of the ReLU output without applying it: the largest logit when it is
+        # positive, and otherwise 0, as argmax picks the first of the all-zero outputs
+        logits = self.logits(x)
+        move = int(logits.argmax())
+        return move if logits[move] > 0 else 0
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from population import NetworkPopulation
+from constants import GRID_SIZE
+from seeding import food_draws
+
+BACKENDS = ('serial', 'threads', 'processes')
+# Evaluation stats that add up over shards; the simulate/inference times are CPU seconds
+SUMMED_STATS = ('ticks', 'ticks_skipped', 'cycles', 'doomed', 'games', 'lifetime', 'simulate_seconds', 'inference_seconds')
+PER_NETWORK_STATS = ('network_scores', 'network_lifetimes', 'network_games')
+
+def _shard_bounds(size, num_shards):
+    edges = np.linspace(0, size, num_shards + 1).astype(int)
+    return [(start, end) for start, end in zip(edges[:-1], edges[1:]) if end > start]
+
+def merge_stats(all_stats):
+    # Sums the tick counters of several evaluations and keeps the best recording if any
+    stats = {key: sum(part[key] for part in all_stats) for key in SUMMED_STATS}
+    stats['best_score'] = max(part['best_score'] for part in all_stats)
+    # Per-network arrays follow each other, as shards do in population order
+    for key in PER_NETWORK_STATS:
+        if key in all_stats[0]:
+            stats[key] = np.concatenate([part[key] for part in all_stats])
+    if 'best_recording' in all_stats[0]:
+        best = max(all_stats, key=lambda part: part['best_fitness'])
+        stats['best_fitness'] = best['best_fitness']
+        stats['best_recording'] = best['best_recording']
+    return stats
+
+def _combine(results):
+    # Fitness in population order and the shards' stats merged
+    return np.concatenate([result[0] for result in results]), merge_stats([result[1] for result in results])
+
+def _evaluate_shard(shm_name, layer_sizes, shape, start, end, games_per_network, seed, record, options):
+    from genetic_algorithm import evaluate_population
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        genomes = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        shard = NetworkPopulation(end - start, layer_sizes[0], layer_sizes[1:-1], layer_sizes[-1], genomes[start:end])
+        result = evaluate_population(shard, games_per_network, np.random.RandomState(seed), record, **options)
+        del genomes, shard
+        return result
+    finally:
+        shm.close()
+
+class ParallelEvaluator:
+    """Evaluates a NetworkPopulation in shards on a thread or process pool."""
+
+    def __init__(self, backend='serial', workers=None, cycle_detection=True, doomed_check=False, grid_size=GRID_SIZE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown evaluation backend {backend!r}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.env_options = {'cycle_detection': cycle_detection, 'doomed_check': doomed_check, 'grid_size': grid_size}
+
+    def _get_executor(self):
+        if self.executor is None:
+            if self.backend == 'threads':
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def options(self, food_seed, first_game, games_per_network):
+        # With food_seed, the food of every game is drawn here once and the same arrays go
+        # to every shard, which makes the fitness independent of backend and workers
+        draws = None
+        if food_seed is not None:
+            draws = food_draws(food_seed, first_game, games_per_network, self.env_options['grid_size'])
+        return dict(self.env_options, food_draws=draws)
+
+    def evaluate(self, networks, games_per_network=1, record=False, food_seed=None, first_game=0):
+        from genetic_algorithm import evaluate_population
+
+        options = self.options(food_seed, first_game, games_per_network)
+
+        if self.backend == 'serial' or self.workers == 1:
+            return evaluate_population(networks, games_per_network, record=record, **options)
+
+        # A few shards per worker so a slow shard does not hold up the whole generation
+        shards = _shard_bounds(len(networks), self.workers * 2)
+        seeds = np.random.randint(0, 2 ** 31 - 1, size=len(shards))
+        executor = self._get_executor()
+
+        if self.backend == 'threads':
+            futures = [executor.submit(evaluate_population, networks.shard(start, end),
+                                       games_per_network, np.random.RandomState(seed), record, **options)
+                       for (start, end), seed in zip(shards, seeds)]
+            return _combine([future.result() for future in futures])
+
+        # Processes map the genome matrix from one shared memory block instead of unpickling networks
+        shm = shared_memory.SharedMemory(create=True, size=networks.genomes.nbytes)
+        try:
+            np.ndarray(networks.genomes.shape, dtype=np.float32, buffer=shm.buf)[:] = networks.genomes
+            futures = [executor.submit(_evaluate_shard, shm.name, networks.layer_sizes, networks.genomes.shape,
+                                       start, end, games_per_network, seed, record, options)
+                       for (start, end), seed in zip(shards, seeds)]
+            return _combine([future.result() for future in futures])
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def evaluate_shards(self, shard_function, size, games_per_network=1, record=False, food_seed=None, *args):
+        # For callers that build their networks inside the worker from a few arguments:
+        # shard_function(start, end, games_per_network, seed, record, options, *args)
+        # evaluates rows start:end and returns (fitness, stats); seed is None when serial.
+        options = self.options(food_seed, 0, games_per_network)
+        if self.backend == 'serial' or self.workers == 1:
+            return shard_function(0, size, games_per_network, None, record, options, *args)
+
+        shards = _shard_bounds(size, self.workers * 2)
+        seeds = np.random.randint(0, 2 ** 31 - 1, size=len(shards))
+        executor = self._get_executor()
+        futures = [executor.submit(shard_function, start, end, games_per_network, seed, record, options, *args)
+                   for (start, end), seed in zip(shards, seeds)]
+        return _combine([future.result() for future in futures])
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
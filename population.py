@@ -0,0 +1,92 @@
+import numpy as np
+from neural_network import NeuralNetwork
+
+class NetworkPopulation:
+    """A whole population as one (size, num_params) float32 genome matrix.
+
+    Each row holds one network's weights layer by layer followed by its biases;
+    weights[l] is a (size, out, in) view and biases[l] a (size, out, 1) view into it.
+    """
+
+    def __init__(self, size, input_size=24, hidden_layer_sizes=[32, 32], output_size=4, genomes=None):
+        self.size = size
+        self.layer_sizes = [input_size] + hidden_layer_sizes + [output_size]
+        self.weight_shapes = [(y, x) for x, y in zip(self.layer_sizes[:-1], self.layer_sizes[1:])]
+        self.bias_shapes = [(y, 1) for y in self.layer_sizes[1:]]
+        self.num_weights = sum(y * x for y, x in self.weight_shapes)
+        weight_ends = np.cumsum([y * x for y, x in self.weight_shapes]).tolist()
+        self.weight_slices = list(zip([0] + weight_ends[:-1], weight_ends))
+        self.num_params = self.num_weights + sum(y for y, _ in self.bias_shapes)
+        if genomes is None:
+            genomes = np.random.randn(size, self.num_params).astype(np.float32)
+        self.genomes = genomes
+
+        self.weights, self.biases = [], []
+        offset = 0
+        for shapes, arrays in ((self.weight_shapes, self.weights), (self.bias_shapes, self.biases)):
+            for shape in shapes:
+                arrays.append(genomes[:, offset:offset + shape[0] * shape[1]].reshape((size,) + shape))
+                offset += shape[0] * shape[1]
+
+    @classmethod
+    def from_networks(cls, networks):
+        # Packs the networks into a genome matrix and rebinds each one as a view onto its row
+        layer_sizes = networks[0].layer_sizes
+        num_params = sum(w.size + b.size for w, b in zip(networks[0].weights, networks[0].biases))
+        population = cls(len(networks), layer_sizes[0], layer_sizes[1:-1], layer_sizes[-1],
+                         np.empty((len(networks), num_params), dtype=np.float32))
+        for l in range(len(layer_sizes) - 1):
+            population.weights[l][:] = [network.weights[l] for network in networks]
+            population.biases[l][:] = [network.biases[l] for network in networks]
+        for i, network in enumerate(networks):
+            network.weights = [w[i] for w in population.weights]
+            network.biases = [b[i] for b in population.biases]
+        return population
+
+    def like(self, genomes=None):
+        # Same architecture over other genomes, a fresh random matrix by default
+        return NetworkPopulation(len(genomes) if genomes is not None else self.size, self.layer_sizes[0],
+                                 self.layer_sizes[1:-1], self.layer_sizes[-1], genomes)
+
+    def weight_layout(self):
+        # Layer index and input column of every weight parameter, in genome order
+        layers = np.concatenate([np.full(y * x, l) for l, (y, x) in enumerate(self.weight_shapes)])
+        columns = np.concatenate([np.tile(np.arange(x), y) for y, x in self.weight_shapes])
+        return layers, columns
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.network(i) for i in range(self.size)[index]]
+        return self.network(index)
+
+    def __iter__(self):
+        return (self.network(i) for i in range(self.size))
+
+    def network(self, index):
+        return NeuralNetwork(self.layer_sizes[0], self.layer_sizes[1:-1], self.layer_sizes[-1],
+                             [w[index] for w in self.weights], [b[index] for b in self.biases])
+
+    def shard(self, start, end):
+        # Rows start:end as a NetworkPopulation sharing this one's genomes
+        return self.like(self.genomes[start:end])
+
+    def networks(self):
+        return [self.network(i) for i in range(self.size)]
+
+    def forward_batch(self, observations, rows=None):
+        # observations is (size, inputs) or (size, games, inputs); returns the argmax move
+        # of every network for every observation, as NeuralNetwork.predict would.
+        # With rows, only those networks are run and observations has len(rows) entries.
+        observations = np.asarray(observations, dtype=np.float32)
+        weights, biases = self.weights, self.biases
+        if rows is not None:
+            weights = [w[rows] for w in weights]
+            biases = [b[rows] for b in biases]
+        activation = np.swapaxes(observations.reshape(len(observations), -1, self.layer_sizes[0]), 1, 2)
+        for w, b in zip(weights, biases):
+            activation = np.maximum(0, np.matmul(w, activation) + b)
+        moves = np.argmax(activation, axis=1)
+        return moves.reshape(observations.shape[:-1])
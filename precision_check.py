@@ -0,0 +1,103 @@
+import argparse
+import random
+import sys
+import time
+import numpy as np
+from constants import GRID_SIZE
+from game import SnakeGame
+from neural_network import NeuralNetwork, PRECISIONS
+from recording import ReplayGame, read_recordings
+
+# Checks compiled networks against the float64 NeuralNetwork: python -m precision_check --help.
+# For every model and precision it reports how often predict() picks the same move on
+# a corpus of recorded observations, the speedup of predict() and the parameter memory
+# saved. Exits 1 when any agreement is below --min-agreement.
+
+def observation_corpus(network, replay_paths=(), games=50, grid_size=GRID_SIZE, seed=0):
+    # Every observation seen while replaying the recordings, or while the network plays
+    # its own seeded games when there are none
+    observations = []
+    games_played = []
+    for path in replay_paths:
+        games_played.extend(ReplayGame(recording, render=False) for recording in read_recordings(path))
+    for game in games_played:
+        while True:
+            observations.append(game.snake.look(game.food))
+            if not game.update():
+                break
+    if not replay_paths:
+        rng = np.random.default_rng(seed)
+        for _ in range(games):
+            game = SnakeGame(render=False, grid_size=grid_size, rng=rng)
+            game.neural_network = network
+            while True:
+                observations.append(game.snake.look(game.food))
+                if not game.update():
+                    break
+    return np.array(observations).reshape(len(observations), -1, 1)
+
+def argmax_agreement(network, compiled, observations):
+    # Fraction of observations where both pick the same move, and the ones where they don't
+    mismatches = [i for i, x in enumerate(observations) if network.predict(x) != compiled.predict(x)]
+    return 1 - len(mismatches) / len(observations), mismatches
+
+def calls_per_second(predict, observations, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for x in observations:
+            predict(x)
+        best = min(best, time.perf_counter() - started)
+    return len(observations) / best
+
+def check_network(network, observations, precisions=PRECISIONS, repeat=3):
+    float64_bytes = sum(np.asarray(a, dtype=np.float64).nbytes for a in network.weights + network.biases)
+    baseline = calls_per_second(network.predict, observations, repeat)
+    results = {}
+    for precision in precisions:
+        compiled = network.compile(precision)
+        agreement, mismatches = argmax_agreement(network, compiled, observations)
+        results[precision] = {
+            'agreement': agreement,
+            'mismatches': len(mismatches),
+            'speedup': calls_per_second(compiled.predict, observations, repeat) / baseline,
+            'bytes': compiled.nbytes,
+            'float64_bytes': float64_bytes,
+            'memory_saving': 1 - compiled.nbytes / float64_bytes,
+            'scratch_bytes': compiled.scratch_nbytes,
+        }
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m precision_check",
+                                     description="Check compiled float32/int8 networks against the float64 path.")
+    parser.add_argument("models", nargs="+", help="model .json files saved by NeuralNetwork.save")
+    parser.add_argument("--replays", nargs="+", default=[],
+                        help="replay .bin files whose observations form the corpus; "
+                             "otherwise every model plays --games games of its own")
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--precision", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="fail when a compiled network agrees with float64 on fewer observations")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(0)
+    failed = False
+    for path in args.models:
+        network = NeuralNetwork().load(path)
+        observations = observation_corpus(network, args.replays, args.games, args.grid_size)
+        print(f"{path}: {len(observations)} observations")
+        for precision, result in check_network(network, observations, args.precision, args.repeat).items():
+            low = result['agreement'] < args.min_agreement
+            failed |= low
+            print(f"  {precision:8s} agreement {result['agreement']:.4%} ({result['mismatches']} differ), "
+                  f"predict {result['speedup']:.2f}x faster, {result['bytes']} bytes vs "
+                  f"{result['float64_bytes']} ({result['memory_saving']:.0%} saved){'  BELOW THRESHOLD' if low else ''}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import math
+import numpy as np
+from parallel_eval import merge_stats
+
+class RacingEvaluator:
+    """Successive halving over games, in front of a ParallelEvaluator.
+
+    Every network plays one game, the best 1/eta of them play up to eta games, the best
+    1/eta of those up to eta**2 games and so on until games_per_network. A network's
+    fitness is the mean of the games it played, capped so that a network dropped on one
+    rung never ranks above one that raced further.
+    """
+
+    def __init__(self, evaluator, eta=2):
+        if eta < 2:
+            raise ValueError(f"Racing needs eta of at least 2, got {eta}")
+        self.evaluator = evaluator
+        self.eta = eta
+
+    def schedule(self, size, games_per_network):
+        # (networks, total games each) on every rung
+        rungs = []
+        networks, games = size, 1
+        while games < games_per_network:
+            rungs.append((networks, games))
+            networks, games = max(math.ceil(networks / self.eta), 1), games * self.eta
+        rungs.append((networks, games_per_network))
+        return rungs
+
+    def evaluate(self, networks, games_per_network=1, record=False, food_seed=None):
+        totals = np.zeros(len(networks))
+        games_played = np.zeros(len(networks), dtype=np.int64)
+        rows = np.arange(len(networks))
+        played = 0
+        scores, lifetimes = np.zeros(len(networks), dtype=np.int64), np.zeros(len(networks), dtype=np.int64)
+        all_stats = []
+        dropped = []
+        rungs = self.schedule(len(networks), games_per_network)
+        for size, games in rungs:
+            if size < len(rows):
+                # Promote the best by their mean so far, keeping population order
+                order = np.argsort(-totals[rows], kind='stable')
+                dropped.append(np.sort(rows[order[size:]]))
+                rows = np.sort(rows[order[:size]])
+            racers = networks if len(rows) == len(networks) else networks.like(networks.genomes[rows])
+            # With food_seed the new games continue the seeded sequence instead of replaying it
+            fitness, stats = self.evaluator.evaluate(racers, games - played, record, food_seed, first_game=played)
+            totals[rows] += fitness * (games - played)
+            games_played[rows] = games
+            played = games
+            scores[rows] = np.maximum(scores[rows], stats.pop('network_scores'))
+            lifetimes[rows] += stats.pop('network_lifetimes')
+            stats.pop('network_games')
+            all_stats.append(stats)
+
+        # A dropped network lost to every promoted one on the same games, so it never ranks
+        # above any network that raced further
+        fitness = totals / games_played
+        floor = fitness[rows].min()
+        for rung in reversed(dropped):
+            fitness[rung] = np.minimum(fitness[rung], floor)
+            floor = min(floor, fitness[rung].min())
+        stats = merge_stats(all_stats)
+        stats.update(network_scores=scores, network_lifetimes=lifetimes, network_games=games_played)
+        stats['rungs'] = rungs
+        return fitness, stats
+
+    def close(self):
+        self.evaluator.close()
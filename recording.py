@@ -0,0 +1,86 @@
+import struct
+import numpy as np
+from game import SnakeGame
+
+# A recorded game is its food sequence plus the direction taken on every tick, as an
+# index into SnakeGame's [Right, Left, Down, Up], packed four ticks to a byte.
+# Record layout: header, food coordinates (uint8, or uint16 on boards over 256 cells
+# wide), packed directions. Archives are records each prefixed with a uint32 length.
+MAGIC = b'SNKR'
+HEADER = struct.Struct('<4sBHII')  # magic, coordinate bytes, grid size, ticks, food count
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+def pack_actions(actions):
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions & 3
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).tobytes()
+
+def unpack_actions(data, num_ticks):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    quads = np.stack([packed & 3, packed >> 2 & 3, packed >> 4 & 3, packed >> 6 & 3], axis=1)
+    return quads.reshape(-1)[:num_ticks]
+
+class GameRecording:
+    def __init__(self, grid_size, food, actions):
+        self.grid_size = grid_size
+        self.food = np.asarray(food, dtype=np.int64).reshape(-1, 2)
+        self.actions = np.asarray(actions, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def to_bytes(self):
+        coordinate_bytes = 1 if self.grid_size <= 256 else 2
+        food = self.food.astype(np.uint8 if coordinate_bytes == 1 else '<u2')
+        header = HEADER.pack(MAGIC, coordinate_bytes, self.grid_size, len(self.actions), len(self.food))
+        return header + food.tobytes() + pack_actions(self.actions)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, coordinate_bytes, grid_size, num_ticks, num_food = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a snake game recording")
+        food_end = HEADER.size + num_food * 2 * coordinate_bytes
+        food = np.frombuffer(data[HEADER.size:food_end], dtype=np.uint8 if coordinate_bytes == 1 else '<u2')
+        return cls(grid_size, food.astype(np.int64), unpack_actions(data[food_end:], num_ticks))
+
+def append_recording(path, recording):
+    data = recording.to_bytes()
+    with open(path, 'ab') as f:
+        f.write(struct.pack('<I', len(data)) + data)
+    return len(data) + 4
+
+def read_recordings(path):
+    with open(path, 'rb') as f:
+        while True:
+            prefix = f.read(4)
+            if len(prefix) < 4:
+                return
+            length, = struct.unpack('<I', prefix)
+            yield GameRecording.from_bytes(f.read(length))
+
+class ReplayGame(SnakeGame):
+    """Plays a GameRecording through the normal SnakeGame rules, no network needed."""
+
+    def __init__(self, recording, render=True):
+        self.recording = recording
+        self.tick = 0
+        super().__init__(render=render, food_positions=[tuple(int(v) for v in f) for f in recording.food],
+                         grid_size=recording.grid_size)
+
+    def update(self):
+        if self.tick >= len(self.recording.actions):
+            return False
+        self.snake.set_direction(DIRECTIONS[self.recording.actions[self.tick]])
+        self.tick += 1
+        return super().update()
+
+    def seek(self, tick):
+        # Replays from the start when going backwards; the moves are cheap without a network
+        if tick < self.tick:
+            self.__init__(self.recording, self.render)
+        while self.tick < tick and self.update():
+            pass
+        return self
@@ -0,0 +1,35 @@
+import numpy as np
+
+# What each stream of a generation is drawn for. Every purpose has its own stream, so
+# drawing more for one never shifts the numbers another sees.
+STREAMS = ('population', 'food', 'food_positions', 'selection', 'crossover', 'mutation', 'perturbation')
+
+class SeedStreams:
+    """Independent random streams for every part of a run, all derived from one seed.
+
+    Streams are keyed instead of spawned in turn: the stream of (generation, purpose)
+    is SeedSequence(entropy, spawn_key=(generation, purpose)) no matter which process
+    asks for it or what was drawn before, so a resumed or sharded run draws exactly
+    what an uninterrupted serial one does.
+    """
+
+    def __init__(self, seed=None):
+        # Without a seed the entropy comes from the OS; it is kept so checkpoints can restore it
+        self.entropy = np.random.SeedSequence(seed).entropy
+
+    def sequence(self, generation, purpose, *key):
+        return np.random.SeedSequence(self.entropy, spawn_key=(generation, STREAMS.index(purpose)) + key)
+
+    def generator(self, generation, purpose, *key):
+        return np.random.default_rng(self.sequence(generation, purpose, *key))
+
+    def food_seed(self, generation):
+        # Seed of the food every network plays in this generation, as for eval_seed
+        return int(self.sequence(generation, 'food').generate_state(1)[0] >> 1)
+
+def food_draws(food_seed, first_game, num_games, grid_size):
+    # One row of uniforms per evaluation game, each from its own stream: game j of every
+    # network places its k-th food with row j, column k. Built once per generation and
+    # handed to every evaluator, so sharding cannot change the food.
+    return np.stack([np.random.default_rng([food_seed, game]).random(grid_size * grid_size)
+                     for game in range(first_game, first_game + num_games)])
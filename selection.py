@@ -0,0 +1,50 @@
+import numpy as np
+
+# Parent selection operators. Each draws every parent index a generation needs in one
+# go and returns them as an int array that GeneticAlgorithm.crossover consumes directly.
+
+def tournament_selection(fitness, num_parents, tournament_size=75, rng=np.random):
+    # Contestants are drawn with replacement, which is what makes one (num_parents, size)
+    # draw possible; for tournaments much smaller than the population it hardly matters.
+    fitness = np.asarray(fitness)
+    tournament_size = min(tournament_size, len(fitness))
+    contestants = (rng.random((num_parents, tournament_size)) * len(fitness)).astype(np.int64)
+    winners = np.argmax(fitness[contestants], axis=1)
+    return contestants[np.arange(num_parents), winners]
+
+def rank_selection(fitness, num_parents, selection_pressure=1.5, rng=np.random):
+    # Linear ranking: the worst individual gets weight 2 - pressure, the best gets pressure
+    fitness = np.asarray(fitness)
+    size = len(fitness)
+    ranks = np.empty(size)
+    ranks[np.argsort(fitness, kind='stable')] = np.arange(size)
+    weights = (2 - selection_pressure) + 2 * (selection_pressure - 1) * ranks / max(size - 1, 1)
+    return _sus(weights, num_parents, rng)
+
+def stochastic_universal_sampling(fitness, num_parents, rng=np.random):
+    # Fitness shifted so the worst has weight 0
+    fitness = np.asarray(fitness, dtype=np.float64)
+    weights = fitness - fitness.min()
+    if weights.sum() <= 0:
+        weights = np.ones_like(weights)
+    return _sus(weights, num_parents, rng)
+
+def _sus(weights, num_parents, rng):
+    # Evenly spaced pointers over the cumulative weights
+    cumulative = np.cumsum(weights)
+    spacing = cumulative[-1] / num_parents
+    pointers = rng.random() * spacing + np.arange(num_parents) * spacing
+    parents = np.minimum(np.searchsorted(cumulative, pointers, side='right'), len(weights) - 1)
+    # Pointers come out sorted by index, so shuffle before they are paired up
+    return rng.permutation(parents)
+
+SELECTION_METHODS = {
+    'tournament': tournament_selection,
+    'rank': rank_selection,
+    'sus': stochastic_universal_sampling,
+}
+
+def select_parents(fitness, num_parents, method='tournament', rng=np.random, **kwargs):
+    if method not in SELECTION_METHODS:
+        raise ValueError(f"Unknown selection method {method!r}, expected one of {tuple(SELECTION_METHODS)}")
+    return SELECTION_METHODS[method](fitness, num_parents, rng=rng, **kwargs)
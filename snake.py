@@ -1,13 +1,28 @@
 import logging
 import random
+from collections import Counter, deque
+import numpy as np
 from constants import GRID_SIZE
+from utils import VISION_DIRECTIONS
+from fitness import calculate_fitness
 
 # Configure logging
 #logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Snake:
-    def __init__(self, initial_position):
-        self.body = [initial_position]
+    def __init__(self, initial_position, grid_size=GRID_SIZE):
+        self.grid_size = grid_size
+        # How many body segments cover each cell; the extra last cell is the ray padding
+        self.occupancy = np.zeros(grid_size * grid_size + 1, dtype=np.uint8)
+        # The occupied cells of every row, column and diagonal as int bitmasks, so the
+        # nearest body segment along a ray is a few integer operations on any board.
+        # Rows are indexed by x with bit y; the rest by their line with bit x.
+        self.row_bits = [0] * grid_size
+        self.column_bits = [0] * grid_size
+        self.diagonal_bits = [0] * (2 * grid_size - 1)  # x - y + grid_size - 1
+        self.antidiagonal_bits = [0] * (2 * grid_size - 1)  # x + y
+        self.body = deque()
+        self.push_head(initial_position)
         self.direction = (0, 1)
         self.grow_flag = False
         self.lifetime = 0
@@ -15,9 +30,13 @@ class Snake:
         self.moves = 200
         self.max_moves = 500
         self.fitness = 0
-        self.previous_positions = []
+        # The new head plus the 50 before it, with counts so a repeat is found in O(1)
+        self.previous_positions = deque(maxlen=51)
+        self.position_counts = Counter()
         self.loop_penalty = 0
-        self.visited_positions = set()
+        # Visited cells as a bitset, one bit per cell, and how many positions were visited
+        self.visited = bytearray((grid_size * grid_size + 7) // 8)
+        self.visited_count = 0
         self.last_food_position = initial_position
         self.replay = False
         self.food_positions = []
@@ -26,99 +45,139 @@ class Snake:
     def set_direction(self, new_direction):
         self.direction = new_direction
 
+    def cell_index(self, position):
+        x, y = position
+        if 0 <= x < self.grid_size and 0 <= y < self.grid_size:
+            return x * self.grid_size + y
+        return None
+
+    def occupies(self, position):
+        cell = self.cell_index(position)
+        return cell is not None and self.occupancy[cell] > 0
+
+    def flip_bits(self, position):
+        x, y = position
+        self.row_bits[x] ^= 1 << y
+        self.column_bits[y] ^= 1 << x
+        self.diagonal_bits[x - y + self.grid_size - 1] ^= 1 << x
+        self.antidiagonal_bits[x + y] ^= 1 << x
+
+    def push_head(self, position):
+        self.body.appendleft(position)
+        cell = self.cell_index(position)
+        if cell is not None:
+            if not self.occupancy[cell]:
+                self.flip_bits(position)
+            self.occupancy[cell] += 1
+
+    def pop_tail(self):
+        position = self.body.pop()
+        cell = self.cell_index(position)
+        if cell is not None:
+            self.occupancy[cell] -= 1
+            if not self.occupancy[cell]:
+                self.flip_bits(position)
+
     def move(self):
         self.lifetime += 1
         self.moves -= 1
         head_x, head_y = self.body[0]
         new_head = (head_x + self.direction[0], head_y + self.direction[1])
-        self.body.insert(0, new_head)
+        self.push_head(new_head)
 
         if not self.grow_flag:
-            self.body.pop()
+            self.pop_tail()
         else:
             self.grow_flag = False
 
-        if len(self.previous_positions) > 50:
-            self.previous_positions.pop(0)
+        if len(self.previous_positions) == self.previous_positions.maxlen:
+            self.position_counts[self.previous_positions[0]] -= 1
         self.previous_positions.append(new_head)
+        self.position_counts[new_head] += 1
 
-        if self.previous_positions.count(new_head) > 1:
+        if self.position_counts[new_head] > 1:
             self.loop_penalty += 2
 
-        self.visited_positions.add(new_head)
+        cell = self.cell_index(new_head)
+        if cell is None:
+            # Off the board, where the game ends, so never a position seen before
+            self.visited_count += 1
+        elif not self.visited[cell >> 3] >> (cell & 7) & 1:
+            self.visited[cell >> 3] |= 1 << (cell & 7)
+            self.visited_count += 1
 
     def grow(self):
         self.grow_flag = True
-        self.previous_positions = []
+        self.previous_positions.clear()
+        self.position_counts.clear()
         self.loop_penalty = 0
         self.moves = min(self.moves + 100, self.max_moves)
 
-    def check_collision(self, grid_size):
+    def check_collision(self, grid_size=None):
+        grid_size = self.grid_size if grid_size is None else grid_size
         head_x, head_y = self.body[0]
         if not (0 <= head_x < grid_size and 0 <= head_y < grid_size):
             return True
-        if (head_x, head_y) in self.body[1:]:
+        # The head counts once itself, anything more is body[1:]
+        if self.occupancy[self.cell_index(self.body[0])] > 1:
             return True
         return False
 
-    def look(self, food, grid_size):
+    def look(self, food, grid_size=None):
         vision = []
-        directions = [
-            (-1, 0), (1, 0), (0, -1), (0, 1),
-            (-1, -1), (-1, 1), (1, -1), (1, 1)
-        ]
-
-        for direction in directions:
-            vision.extend(self.look_in_direction(direction, food, grid_size))
-        return vision
-
-    def look_in_direction(self, direction, food, grid_size):
-        look = [0, 0, 0]
-        pos = [self.body[0][0], self.body[0][1]]
-        distance = 0
-        food_found = False
-        body_found = False
-
-        while 0 <= pos[0] < grid_size and 0 <= pos[1] < grid_size:
-            pos[0] += direction[0]
-            pos[1] += direction[1]
-            distance += 1
-
-            if not food_found and (pos[0], pos[1]) == food:
-                food_found = True
-                look[0] = 1 / distance
-            if not body_found and (pos[0], pos[1]) in self.body[1:]:
-                body_found = True
-                look[1] = 1 / distance
-
-        look[2] = 1 / distance if distance > 0 else 0
-        return look
-
-    def calculate_fitness(self, food_position):
-        if self.score < 10:
-            self.fitness = self.lifetime * (2 ** self.score)
+        for d in range(len(VISION_DIRECTIONS)):
+            vision.extend(self.look_ray(d, food))
+        return np.array(vision)
+
+    def look_in_direction(self, direction, food, grid_size=None):
+        return self.look_ray(VISION_DIRECTIONS.index(direction), food)
+
+    def look_ray(self, d, food):
+        # [food, body, wall] inverse distances along vision direction d; the food ray
+        # does not stop at the body
+        x, y = self.body[0]
+        dx, dy = VISION_DIRECTIONS[d]
+        last = self.grid_size - 1
+
+        # Steps until the ray leaves the board
+        wall = min(x + 1 if dx < 0 else last - x + 1 if dx > 0 else self.grid_size,
+                   y + 1 if dy < 0 else last - y + 1 if dy > 0 else self.grid_size)
+
+        # Food on the ray is k steps away with food = head + k * (dx, dy)
+        food_steps = 0
+        offset_x, offset_y = food[0] - x, food[1] - y
+        if dx == 0:
+            if offset_x == 0 and offset_y * dy > 0:
+                food_steps = abs(offset_y)
+        elif offset_x * dx > 0 and offset_y == offset_x * dx * dy:
+            food_steps = abs(offset_x)
+
+        # The ray's line as a bitmask with the head at bit p; the nearest body segment is
+        # the highest set bit below p or the lowest one above it
+        if dx == 0:
+            line, p = self.row_bits[x], y
+        elif dy == 0:
+            line, p = self.column_bits[y], x
+        elif dx == dy:
+            line, p = self.diagonal_bits[x - y + last], x
         else:
-            self.fitness = self.lifetime
-            self.fitness *= 2 ** 10
-            self.fitness *= (self.score - 9)
-
-        # Existing penalties
-        self.fitness -= self.loop_penalty * 500
-
-        head_x, head_y = self.body[0]
-        food_x, food_y = food_position
-        distance_to_food = abs(head_x - food_x) + abs(head_y - food_y)
-
-        self.fitness += (1 / (distance_to_food + 1)) * 1000
-        self.fitness += len(self.visited_positions) * 500
-        self.fitness += self.score * 5000
-
-        ''' # Additional penalties and rewards
-        self.fitness += self.rewards_for_pattern_adherence()'''
+            line, p = self.antidiagonal_bits[x + y], x
+        body_steps = 0
+        if (dy if dx == 0 else dx) < 0:
+            below = line & ((1 << p) - 1)
+            if below:
+                body_steps = p - below.bit_length() + 1
+        else:
+            above = line >> (p + 1)
+            if above:
+                body_steps = (above & -above).bit_length()
 
-        if self.check_collision(GRID_SIZE):
-            self.fitness -= 2000
+        return [1 / food_steps if food_steps else 0, 1 / body_steps if body_steps else 0, 1 / wall]
 
+    def calculate_fitness(self, food_position):
+        # The population formula, for this one game
+        self.fitness = float(calculate_fitness([self.lifetime], [self.score], [self.loop_penalty], [self.body[0]],
+                                               [food_position], [self.visited_count], [self.check_collision()])[0])
         return self.fitness
 
     '''def rewards_for_pattern_adherence(self):
@@ -147,10 +206,10 @@ class Snake:
         self.lifetime += 1
         head_x, head_y = self.body[0]
         new_head = (head_x + self.direction[0], head_y + self.direction[1])
-        self.body.insert(0, new_head)
+        self.push_head(new_head)
 
         if not self.grow_flag:
-            self.body.pop()
+            self.pop_tail()
         else:
             self.grow_flag = False
 
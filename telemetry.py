@@ -0,0 +1,134 @@
+import json
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+class PhaseTimer:
+    """Wall-clock seconds per named phase of one generation."""
+
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - started
+
+class TelemetryWriter:
+    """Appends one JSON record per line from a background thread.
+
+    write() only puts the record on a queue, so the training loop never waits on the
+    disk. Records still queued when close() is called are written before it returns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        with open(self.path, 'a') as f:
+            while True:
+                record = self.records.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record) + '\n')
+                # Flush whenever the queue runs dry so the log can be tailed while training
+                if self.records.empty():
+                    f.flush()
+
+    def write(self, record):
+        self.records.put(record)
+
+    def close(self):
+        self.records.put(None)
+        self.thread.join()
+
+def fitness_summary(fitness):
+    fitness = np.asarray(fitness, dtype=np.float64)
+    summary = {'min': float(fitness.min()), 'mean': float(fitness.mean()), 'max': float(fitness.max()),
+               'std': float(fitness.std())}
+    for percentile, value in zip(PERCENTILES, np.percentile(fitness, PERCENTILES)):
+        summary[f'p{percentile}'] = float(value)
+    return summary
+
+def generation_record(gen_alg, generation, phases):
+    # Everything known about one finished generation, as plain JSON types
+    stats = gen_alg.evaluation_stats
+    record = {
+        'generation': generation,
+        'time': time.time(),
+        'phases': phases,
+        'turnover': gen_alg.turnover_times,
+        'mutation_rate': gen_alg.mutation_rate,
+    }
+    if gen_alg.raw_fitness is not None:
+        record['fitness'] = fitness_summary(gen_alg.raw_fitness)
+    if stats:
+        record['best_score'] = stats['best_score']
+        record['mean_lifetime'] = stats['lifetime'] / stats['games'] if stats['games'] else 0.0
+        for key in ('ticks', 'ticks_skipped', 'cycles', 'doomed', 'simulate_seconds', 'inference_seconds'):
+            record[key] = stats[key]
+        if 'cache' in stats:
+            record['cache'] = stats['cache']
+    return record
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval while running.
+
+    Lower overhead than cProfile, and the collapsed-stack output ("outer;inner count"
+    per line) loads straight into flame graph tools.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = Counter()
+        self.samples = 0
+        self.running = threading.Event()
+        self.thread = None
+
+    def _run(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
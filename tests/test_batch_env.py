@@ -0,0 +1,94 @@
+import itertools
+import numpy as np
+import pytest
+from batch_env import BatchSnakeEnv, END_CYCLE, END_DOOMED
+from game import SnakeGame
+from population import NetworkPopulation
+
+def play_snake_games(networks, grid_size):
+    # Fitness and food of every network's SnakeGame, each with its own seeded food
+    fitness, food = [], []
+    for i, network in enumerate(networks):
+        game = SnakeGame(render=False, grid_size=grid_size, rng=np.random.default_rng(i))
+        game.neural_network = network
+        while game.update():
+            pass
+        fitness.append(game.snake.calculate_fitness(game.food))
+        food.append(list(game.food_positions))
+    return np.array(fitness), food
+
+def play_batch(networks, grid_size, food, **options):
+    # The same games in one BatchSnakeEnv, with every move chosen by the same NeuralNetwork
+    longest = max(len(positions) for positions in food)
+    food_positions = [positions + positions[-1:] * (longest - len(positions)) for positions in food]
+    env = BatchSnakeEnv(len(networks), grid_size=grid_size, food_positions=food_positions, **options)
+    moves = np.zeros(len(networks), dtype=np.int64)
+    while env.alive.any():
+        vision = env.observe()
+        for row in np.flatnonzero(env.alive):
+            moves[row] = np.argmax(networks[row].forward(vision[row].reshape(-1, 1)))
+        env.step(moves)
+    return env
+
+def some_loopers(grid_size, candidates=2000, others=30):
+    # Random networks rarely loop, so screen many for the ones that do and add a few others
+    genomes = np.random.default_rng(grid_size).standard_normal((candidates, NetworkPopulation(0).num_params))
+    population = NetworkPopulation(candidates, genomes=genomes.astype(np.float32))
+    env = BatchSnakeEnv(candidates, grid_size=grid_size, rng=np.random.RandomState(0), cycle_detection=True)
+    while env.alive.any():
+        env.step(population.forward_batch(env.observe()[:, None]).reshape(-1))
+    rows = np.concatenate([np.flatnonzero(env.early_end == END_CYCLE), np.arange(others)])
+    return population.like(population.genomes[rows]).networks()
+
+@pytest.mark.parametrize('grid_size', [7, 10, 15])
+def test_batch_env_matches_snake_game(grid_size):
+    networks = some_loopers(grid_size)
+    fitness, food = play_snake_games(networks, grid_size)
+
+    played_out = play_batch(networks, grid_size, food, cycle_detection=False)
+    assert np.array_equal(played_out.fitness(), fitness)
+
+    # Cycle detection skips the ticks of looping snakes but must reach the same end
+    fast_forwarded = play_batch(networks, grid_size, food, cycle_detection=True)
+    assert fast_forwarded.ticks_skipped > 0
+    assert np.array_equal(fast_forwarded.fitness(), fitness)
+    assert np.array_equal(fast_forwarded.lifetimes, played_out.lifetimes)
+    assert fast_forwarded.ticks < played_out.ticks
+
+def test_batch_env_matches_snake_game_on_a_large_board():
+    networks = NetworkPopulation(30, genomes=np.random.default_rng(40).standard_normal(
+        (30, NetworkPopulation(0).num_params)).astype(np.float32)).networks()
+    fitness, food = play_snake_games(networks, 40)
+    assert np.array_equal(play_batch(networks, 40, food, cycle_detection=True).fitness(), fitness)
+
+# On a 6x6 board the snake eats its way along these cells, then its head at (0, 5) is
+# sealed into the pocket (0, 5), (1, 5), (1, 4) by its own body, with the food at (0, 0)
+TRAP_MOVES = [0, 0, 3, 1, 1, 3, 3, 0, 0]
+TRAP_FOOD = [[3, 4], [3, 5], [2, 5], [2, 4], [2, 3], [1, 3], [0, 3], [0, 4], [0, 5], [0, 0]]
+
+def test_doomed_check_ends_a_sealed_in_snake():
+    env = BatchSnakeEnv(1, grid_size=6, food_positions=[TRAP_FOOD], doomed_check=True)
+    for move in TRAP_MOVES:
+        env.step(np.array([move]))
+    assert env.early_end[0] == END_DOOMED
+    assert not env.alive[0] and env.collided[0]
+    assert env.scores[0] == len(TRAP_MOVES)
+
+    # Played out, every possible continuation collides within the pocket without eating.
+    # The doomed fitness cannot equal a played-out one, as those differ by the moves made.
+    continuations = np.array(list(itertools.product(range(4), repeat=4)))
+    played = BatchSnakeEnv(len(continuations), grid_size=6, food_positions=[TRAP_FOOD] * len(continuations))
+    for move in TRAP_MOVES:
+        played.step(np.full(len(continuations), move))
+    for tick in range(4):
+        played.step(continuations[:, tick])
+    assert not played.alive.any() and played.collided.all()
+    assert (played.scores == env.scores[0]).all()
+    assert (played.lifetimes <= env.lifetimes[0] + 3).all()
+
+def test_doomed_check_changes_nothing_for_snakes_that_are_not_sealed_in():
+    networks = some_loopers(10)
+    fitness, food = play_snake_games(networks, 10)
+    env = play_batch(networks, 10, food, doomed_check=True)
+    assert (env.early_end != END_DOOMED).all()
+    assert np.array_equal(env.fitness(), fitness)
@@ -0,0 +1,16 @@
+import math
+from benchmark import compare, result
+
+def test_compare_reports_relative_change():
+    comparison = compare({'a': result(90.0, 'ticks/s'), 'b': result(1.1, 's', higher_is_better=False)},
+                         {'a': result(100.0, 'ticks/s'), 'b': result(1.0, 's', higher_is_better=False)}, 0.05)
+    assert math.isclose(comparison['a']['change'], -0.1) and comparison['a']['regression']
+    assert math.isclose(comparison['b']['change'], -0.1) and comparison['b']['regression']
+
+def test_compare_handles_a_zero_baseline():
+    baseline = {'same': result(0, 'ticks'), 'up': result(0, 'ticks'), 'slower': result(0, 's', higher_is_better=False)}
+    comparison = compare({'same': result(0, 'ticks'), 'up': result(5, 'ticks'),
+                          'slower': result(2, 's', higher_is_better=False)}, baseline, 0.1)
+    assert comparison['same']['change'] == 0 and not comparison['same']['regression']
+    assert comparison['up']['change'] == math.inf and not comparison['up']['regression']
+    assert comparison['slower']['change'] == -math.inf and comparison['slower']['regression']
@@ -0,0 +1,66 @@
+import asyncio
+import random
+import numpy as np
+import pytest
+from checkpoint import ALIGNMENT, load_checkpoint, read_checkpoint, save_checkpoint
+from evolution_strategy import EvolutionStrategy
+from game import SnakeGame
+from genetic_algorithm import GeneticAlgorithm
+
+def run(gen_alg, generations):
+    for _ in range(generations):
+        asyncio.run(gen_alg.evaluate_fitness(SnakeGame))
+        gen_alg.create_new_generation()
+    return gen_alg
+
+def test_checkpoint_round_trip(tmp_path):
+    gen_alg = run(GeneticAlgorithm(population_size=30, seed=4), 2)
+    path = tmp_path / 'ga.ckpt'
+    written = save_checkpoint(gen_alg, path)
+    assert written == path.stat().st_size
+
+    header, arrays = read_checkpoint(path)
+    assert header['generation'] == 2
+    assert header['layer_sizes'] == gen_alg.networks.layer_sizes
+    assert header['seed_entropy'] == gen_alg.seeds.entropy
+    assert np.array_equal(arrays['genomes'], gen_alg.networks.genomes)
+    assert arrays['genomes'].offset % ALIGNMENT == 0
+    assert np.array_equal(arrays['fitness_scores'], gen_alg.fitness_scores)
+    assert [tuple(row) for row in arrays['fitness_history'].tolist()] == gen_alg.fitness_history
+
+def test_not_a_checkpoint_is_rejected(tmp_path):
+    path = tmp_path / 'model.json'
+    path.write_text('{}')
+    with pytest.raises(ValueError):
+        read_checkpoint(path)
+
+@pytest.mark.parametrize('options', [{}, {'selection': 'rank'}, {'eval_seed': 3}])
+def test_genetic_algorithm_resume_matches_uninterrupted_run(tmp_path, options):
+    uninterrupted = run(GeneticAlgorithm(population_size=40, seed=9, **options), 4)
+
+    path = tmp_path / 'ga.ckpt'
+    save_checkpoint(run(GeneticAlgorithm(population_size=40, seed=9, **options), 2), path)
+    # Whatever the resuming process's own seed and global random state
+    random.seed(1)
+    np.random.seed(1)
+    resumed = run(load_checkpoint(GeneticAlgorithm(population_size=40, seed=123, **options), path), 2)
+
+    assert resumed.generation == uninterrupted.generation
+    assert np.array_equal(resumed.networks.genomes, uninterrupted.networks.genomes)
+    assert resumed.fitness_history == uninterrupted.fitness_history
+
+def small_es(population_size=20):
+    return EvolutionStrategy(population_size=population_size, noise_table_size=2 ** 16, seed=1)
+
+def test_evolution_strategy_resume_matches_uninterrupted_run(tmp_path):
+    uninterrupted = run(small_es(), 4)
+
+    path = tmp_path / 'es.ckpt'
+    save_checkpoint(run(small_es(), 2), path)
+    resumed = run(load_checkpoint(small_es(population_size=40), path), 2)
+
+    assert resumed.population_size == uninterrupted.population_size == 20
+    assert resumed.adam_steps == uninterrupted.adam_steps
+    assert np.array_equal(resumed.theta, uninterrupted.theta)
+    assert np.array_equal(resumed.adam_m, uninterrupted.adam_m)
+    assert resumed.fitness_history == uninterrupted.fitness_history
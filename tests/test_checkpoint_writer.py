@@ -0,0 +1,52 @@
+import asyncio
+import numpy as np
+import pytest
+from checkpoint import CheckpointWriter, read_checkpoint
+from game import SnakeGame
+from genetic_algorithm import GeneticAlgorithm
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+
+def test_retention_keeps_last_every_nth_and_best(tmp_path):
+    writer = CheckpointWriter(tmp_path, 1, keep_last=2, keep_every=3, keep_best=True)
+    writer.close()
+    writer.generations = list(range(1, 11))
+    writer.best = (5.0, 4)
+    assert writer.retained() == {3, 4, 6, 9, 10}
+    writer.keep_best, writer.keep_every = False, 0
+    assert writer.retained() == {9, 10}
+
+def test_invalid_retention_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CheckpointWriter(tmp_path, 1, keep_last=0)
+    with pytest.raises(ValueError):
+        CheckpointWriter(tmp_path, 1, keep_every=-1)
+
+def test_written_files_follow_the_policy(tmp_path):
+    gen_alg = GeneticAlgorithm(population_size=40, seed=2)
+    writer = CheckpointWriter(tmp_path, 1, keep_last=2, keep_every=3, keep_best=True)
+    best_genomes, best_fitness = {}, {}
+    for _ in range(7):
+        asyncio.run(gen_alg.evaluate_fitness(SnakeGame))
+        gen_alg.create_new_generation()
+        writer.save(gen_alg)
+        best_genomes[gen_alg.generation] = gen_alg.best_genome.copy()
+        best_fitness[gen_alg.generation] = gen_alg.fitness_history[-1][0]
+    writer.close()
+
+    best = max(best_fitness, key=best_fitness.get)
+    kept = {int(path.name[len('game1_gen'):-len('.ckpt')]) for path in tmp_path.glob('game1_gen*.ckpt')}
+    assert kept == {3, 6, 7, best}
+    assert {int(path.name[len('game1_gen'):-len('.json')]) for path in tmp_path.glob('game1_gen*.json')} == kept
+
+    # The best generation's model is the best network that generation evaluated
+    network = NeuralNetwork()
+    network.load(tmp_path / f'game1_gen{best}.json')
+    assert np.array_equal(NetworkPopulation.from_networks([network]).genomes[0], best_genomes[best])
+
+    # The latest files are the last generation's
+    header, arrays = read_checkpoint(tmp_path / 'game1_checkpoint.ckpt')
+    assert header['generation'] == 7
+    assert np.array_equal(arrays['genomes'], gen_alg.networks.genomes)
+    assert (tmp_path / 'game1_progress.json').read_bytes() == (tmp_path / 'game1_gen7.json').read_bytes()
+    assert [write['generation'] for write in writer.drain()] == list(range(1, 8))
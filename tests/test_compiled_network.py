@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from neural_network import NeuralNetwork, PRECISIONS
+from population import NetworkPopulation
+from precision_check import argmax_agreement, observation_corpus
+
+def random_network(seed):
+    genomes = np.random.default_rng(seed).standard_normal((1, NetworkPopulation(0).num_params))
+    return NetworkPopulation(1, genomes=genomes.astype(np.float32)).network(0)
+
+@pytest.fixture(scope='module')
+def corpus():
+    # Observations the networks actually meet while playing, not uniform noise
+    return [(network, observation_corpus(network, games=20, seed=seed))
+            for seed, network in enumerate(random_network(seed) for seed in range(4))]
+
+def test_float32_forward_is_close_to_float64(corpus):
+    for network, observations in corpus:
+        compiled = network.compile('float32')
+        for x in observations[:50]:
+            assert np.allclose(compiled.forward(x), network.forward(x).reshape(-1), rtol=1e-4, atol=1e-4)
+
+@pytest.mark.parametrize('precision, minimum', [('float32', 1.0), ('int8', 0.98)])
+def test_predict_agrees_with_float64(corpus, precision, minimum):
+    for network, observations in corpus:
+        agreement, _ = argmax_agreement(network, network.compile(precision), observations)
+        assert agreement >= minimum
+
+def test_predict_matches_argmax_of_relu_output():
+    # All outputs <= 0 become zeros, so the float64 argmax is move 0
+    network = NeuralNetwork(weights=[np.zeros((32, 24)), np.zeros((32, 32)), np.zeros((4, 32))],
+                            biases=[np.zeros((32, 1)), np.zeros((32, 1)), np.array([[-1.0], [-2.0], [-0.5], [-3.0]])])
+    x = np.ones((24, 1))
+    for precision in PRECISIONS:
+        assert network.compile(precision).predict(x) == network.predict(x) == 0
+
+def test_int8_uses_less_parameter_memory():
+    network = random_network(0)
+    assert network.compile('int8').nbytes < network.compile('float32').nbytes
+
+def test_unknown_precision_is_rejected():
+    with pytest.raises(ValueError):
+        random_network(0).compile('float16')
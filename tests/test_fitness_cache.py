@@ -0,0 +1,19 @@
+import asyncio
+import numpy as np
+from game import SnakeGame
+from genetic_algorithm import GeneticAlgorithm
+
+def test_cached_generation_reports_the_games_it_stands_for():
+    gen_alg = GeneticAlgorithm(population_size=30, eval_seed=7, seed=3)
+    asyncio.run(gen_alg.evaluate_fitness(SnakeGame, 4))
+    simulated = dict(gen_alg.evaluation_stats)
+    fitness = gen_alg.fitness_scores.copy()
+
+    # The same population again is served from the cache alone
+    asyncio.run(gen_alg.evaluate_fitness(SnakeGame, 4))
+    cached = gen_alg.evaluation_stats
+    assert cached['ticks'] == 0 and cached['cache']['hits'] == 30
+    for key in ('games', 'lifetime', 'best_score'):
+        assert cached[key] == simulated[key]
+    assert np.array_equal(gen_alg.fitness_scores, fitness)
+    assert 'network_scores' not in cached
@@ -0,0 +1,32 @@
+import asyncio
+import numpy as np
+import pytest
+from inference_server import MicroBatcher, ModelCache
+from neural_network import NeuralNetwork
+
+class BrokenModel:
+    layer_sizes = [24, 32, 32, 4]
+
+    def forward_batch(self, observations):
+        raise RuntimeError("bad weights")
+
+def test_failed_batch_answers_its_requests_and_spares_other_models(tmp_path):
+    NeuralNetwork().save(tmp_path / 'good.json')
+    cache = ModelCache(tmp_path)
+    get = cache.get
+    cache.get = lambda name: BrokenModel() if name == 'broken.json' else get(name)
+
+    async def play():
+        batcher = MicroBatcher(cache, window=0.001)
+        observation = np.zeros(24, dtype=np.float32)
+        return await asyncio.wait_for(asyncio.gather(batcher.predict('broken.json', observation),
+                                                     batcher.predict('good.json', observation),
+                                                     return_exceptions=True), timeout=5)
+
+    broken, good = asyncio.run(play())
+    assert isinstance(broken, ValueError)
+    assert good in range(4)
+
+def test_models_outside_the_model_directory_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        ModelCache(tmp_path).path('../elsewhere.json')
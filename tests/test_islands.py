@@ -0,0 +1,53 @@
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener
+import numpy as np
+import pytest
+from islands import (TOPOLOGIES, TRANSPORTS, IslandModel, _connect_sockets, _exchange, migration_sources,
+                     migration_targets)
+
+NUM_ISLANDS = 4
+
+def connect(transport, topology):
+    # (outbound, inbound) per island, made the way run_island makes them
+    if transport == 'pipe':
+        return list(zip(*IslandModel(NUM_ISLANDS, topology=topology)._pipes()))
+    authkey = secrets.token_bytes(16)
+    listeners = [Listener(('localhost', 0), authkey=authkey) for _ in range(NUM_ISLANDS)]
+    addresses = [listener.address for listener in listeners]
+    with ThreadPoolExecutor(NUM_ISLANDS) as pool:
+        return list(pool.map(
+            lambda island: _connect_sockets(island, listeners[island], addresses,
+                                            migration_targets(topology, island, NUM_ISLANDS),
+                                            migration_sources(topology, island, NUM_ISLANDS), authkey),
+            range(NUM_ISLANDS)))
+
+def test_topologies():
+    assert [migration_targets('ring', island, NUM_ISLANDS) for island in range(NUM_ISLANDS)] == [[1], [2], [3], [0]]
+    assert migration_sources('ring', 0, NUM_ISLANDS) == [3]
+    assert migration_targets('full', 1, NUM_ISLANDS) == [0, 2, 3]
+    assert migration_sources('full', 1, NUM_ISLANDS) == [0, 2, 3]
+    assert migration_targets('ring', 0, 1) == []
+
+@pytest.mark.parametrize('transport', TRANSPORTS)
+@pytest.mark.parametrize('topology', TOPOLOGIES)
+def test_migrants_reach_the_islands_the_topology_names(topology, transport):
+    connections = connect(transport, topology)
+    # Every island sends migrants carrying its own number
+    with ThreadPoolExecutor(NUM_ISLANDS) as pool:
+        received = list(pool.map(lambda island: _exchange(*connections[island], np.full((2, 3), island)),
+                                 range(NUM_ISLANDS)))
+    for island, migrants in enumerate(received):
+        assert sorted(int(m[0, 0]) for m in migrants) == migration_sources(topology, island, NUM_ISLANDS)
+        assert all(m.shape == (2, 3) for m in migrants)
+    for outbound, inbound in connections:
+        for connection in list(outbound.values()) + list(inbound.values()):
+            connection.close()
+
+@pytest.mark.parametrize('transport', TRANSPORTS)
+def test_best_network_is_the_best_of_the_whole_run(transport):
+    model = IslandModel(2, migration_interval=2, num_migrants=2, transport=transport, population_size=30)
+    best_fitness = model.run(6, seed=4)
+    assert best_fitness == max(best for _, _, best, _, _ in model.history)
+    assert model.best_genome is not None
+    assert sorted(generation for island, generation, *_ in model.history if island == 1) == list(range(1, 7))
@@ -0,0 +1,14 @@
+import numpy as np
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+
+def test_load_takes_the_architecture_from_the_file(tmp_path):
+    saved = NetworkPopulation(1, 24, [16, 8, 12], 4).network(0)
+    saved.save(tmp_path / 'model.json')
+
+    loaded = NeuralNetwork().load(tmp_path / 'model.json')
+    assert loaded.layer_sizes == [24, 16, 8, 12, 4]
+    x = np.random.default_rng(0).random((24, 1))
+    assert np.allclose(loaded.forward(x), saved.forward(x))
+    assert NetworkPopulation.from_networks([loaded]).layer_sizes == [24, 16, 8, 12, 4]
+    assert loaded.compile('float32').predict(x) == saved.predict(x)
@@ -0,0 +1,24 @@
+import asyncio
+import numpy as np
+import pytest
+from game import SnakeGame
+from genetic_algorithm import GeneticAlgorithm
+from parallel_eval import BACKENDS
+
+def one_generation(backend, **options):
+    gen_alg = GeneticAlgorithm(population_size=90, seed=11, backend=backend, workers=3, **options)
+    try:
+        asyncio.run(gen_alg.evaluate_fitness(SnakeGame, 3))
+        fitness = np.array(gen_alg.raw_fitness)
+        gen_alg.create_new_generation()
+        return fitness, gen_alg.networks.genomes.copy()
+    finally:
+        gen_alg.evaluator.close()
+
+@pytest.mark.parametrize('options', [{}, {'racing_eta': 3}, {'doomed_check': True}])
+def test_every_backend_matches_serial(options):
+    serial_fitness, serial_genomes = one_generation('serial', **options)
+    for backend in BACKENDS:
+        fitness, genomes = one_generation(backend, **options)
+        assert np.array_equal(fitness, serial_fitness), backend
+        assert np.array_equal(genomes, serial_genomes), backend
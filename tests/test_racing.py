@@ -0,0 +1,43 @@
+import numpy as np
+from parallel_eval import SUMMED_STATS
+from population import NetworkPopulation
+from racing import RacingEvaluator
+
+class QualityEvaluator:
+    """Stands in for ParallelEvaluator: every game of a network scores its genome's first value."""
+
+    def __init__(self):
+        self.raced = []  # qualities of the networks on every rung
+
+    def evaluate(self, networks, games_per_network=1, record=False, food_seed=None, first_game=0):
+        quality = networks.genomes[:, 0].astype(np.float64)
+        self.raced.append(quality)
+        stats = dict.fromkeys(SUMMED_STATS, 0)
+        stats.update(best_score=0, network_scores=np.zeros(len(quality), dtype=np.int64),
+                     network_lifetimes=np.zeros(len(quality), dtype=np.int64),
+                     network_games=np.full(len(quality), games_per_network))
+        return quality, stats
+
+def test_each_rung_races_the_best_of_the_previous_one():
+    quality = np.random.default_rng(0).permutation(50).astype(np.float32)
+    genomes = np.zeros((50, NetworkPopulation(0).num_params), dtype=np.float32)
+    genomes[:, 0] = quality
+    evaluator = QualityEvaluator()
+    racing = RacingEvaluator(evaluator, eta=3)
+    fitness, stats = racing.evaluate(NetworkPopulation(50, genomes=genomes), 9)
+
+    assert stats['rungs'] == [(50, 1), (17, 3), (6, 9)]
+    for (size, _), raced in zip(stats['rungs'], evaluator.raced):
+        # Survivors are the top size networks, kept in population order
+        assert sorted(raced) == sorted(quality)[-size:]
+    assert [len(raced) for raced in evaluator.raced] == [50, 17, 6]
+
+    # A network dropped on an earlier rung never ranks above one that raced further
+    finalists = np.isin(quality, evaluator.raced[-1])
+    assert fitness[~finalists].max() <= fitness[finalists].min()
+    assert np.array_equal(stats['network_games'], np.where(finalists, 9, np.where(np.isin(quality, evaluator.raced[1]), 3, 1)))
+
+def test_schedule_ends_at_games_per_network():
+    racing = RacingEvaluator(QualityEvaluator(), eta=2)
+    assert racing.schedule(100, 10) == [(100, 1), (50, 2), (25, 4), (13, 8), (7, 10)]
+    assert racing.schedule(100, 1) == [(100, 1)]
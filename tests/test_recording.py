@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from genetic_algorithm import evaluate_population
+from population import NetworkPopulation
+from recording import GameRecording, ReplayGame, append_recording, pack_actions, read_recordings, unpack_actions
+
+@pytest.mark.parametrize('num_ticks', [0, 1, 3, 4, 5, 8, 1001])
+def test_actions_round_trip(num_ticks):
+    actions = np.random.default_rng(num_ticks).integers(0, 4, size=num_ticks).astype(np.uint8)
+    packed = pack_actions(actions)
+    assert len(packed) == -(-num_ticks // 4)
+    assert np.array_equal(unpack_actions(packed, num_ticks), actions)
+
+@pytest.mark.parametrize('grid_size', [10, 300])
+def test_recording_round_trip(grid_size):
+    rng = np.random.default_rng(grid_size)
+    recording = GameRecording(grid_size, rng.integers(0, grid_size, size=(7, 2)), rng.integers(0, 4, size=37))
+    restored = GameRecording.from_bytes(recording.to_bytes())
+    assert restored.grid_size == grid_size
+    assert np.array_equal(restored.food, recording.food)
+    assert np.array_equal(restored.actions, recording.actions)
+
+def test_archive_round_trip(tmp_path):
+    path = tmp_path / 'replays.bin'
+    recordings = [GameRecording(10, [(i, i)], [i % 4] * (i + 1)) for i in range(5)]
+    for recording in recordings:
+        append_recording(path, recording)
+    restored = list(read_recordings(path))
+    assert [len(r) for r in restored] == [len(r) for r in recordings]
+    assert all(np.array_equal(a.food, b.food) for a, b in zip(restored, recordings))
+
+def test_garbage_is_not_a_recording():
+    with pytest.raises(ValueError):
+        GameRecording.from_bytes(b'\0' * 32)
+
+@pytest.mark.parametrize('cycle_detection', [False, True])
+def test_replay_reaches_the_recorded_fitness(cycle_detection):
+    networks = NetworkPopulation(200, genomes=np.random.default_rng(5).standard_normal(
+        (200, NetworkPopulation(0).num_params)).astype(np.float32))
+    _, stats = evaluate_population(networks, 2, np.random.RandomState(5), record=True, cycle_detection=cycle_detection)
+    recording = GameRecording.from_bytes(stats['best_recording'].to_bytes())
+
+    game = ReplayGame(recording, render=False)
+    while game.update():
+        pass
+    assert game.tick == len(recording)
+    assert game.snake.calculate_fitness(game.food) == stats['best_fitness']
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from selection import rank_selection, select_parents, stochastic_universal_sampling, tournament_selection
+
+def mean_copies(select, fitness, draws=400, **kwargs):
+    # Average number of times each individual is picked when drawing len(fitness) parents
+    counts = np.zeros(len(fitness))
+    for seed in range(draws):
+        parents = select(fitness, len(fitness), rng=np.random.default_rng(seed), **kwargs)
+        counts += np.bincount(parents, minlength=len(fitness))
+    return counts / draws
+
+def test_rank_selection_weights_follow_pressure():
+    fitness = np.random.default_rng(0).permutation(20).astype(float)
+    worst, best = np.argmin(fitness), np.argmax(fitness)
+    copies = {p: mean_copies(rank_selection, fitness, selection_pressure=p) for p in (1.1, 1.5, 2.0)}
+    for pressure, expected in copies.items():
+        # With as many parents as individuals, expected copies equal the linear-rank weights
+        assert expected[worst] == pytest.approx(2 - pressure, abs=0.05)
+        assert expected[best] == pytest.approx(pressure, abs=0.05)
+    assert copies[1.1][best] < copies[1.5][best] < copies[2.0][best]
+
+def test_rank_selection_ignores_fitness_scale():
+    fitness = np.array([1.0, 5.0, 1000.0, -3.0])
+    ranked = mean_copies(rank_selection, fitness)
+    assert np.allclose(ranked, mean_copies(rank_selection, np.argsort(np.argsort(fitness)).astype(float)))
+
+def test_sus_is_proportional_to_shifted_fitness():
+    fitness = np.array([2.0, 3.0, 4.0, 6.0])
+    copies = mean_copies(stochastic_universal_sampling, fitness, draws=4000)
+    assert np.allclose(copies, len(fitness) * (fitness - 2) / (fitness - 2).sum(), atol=0.05)
+
+def test_sus_with_equal_fitness_is_uniform():
+    parents = stochastic_universal_sampling(np.full(8, 3.0), 8, rng=np.random.default_rng(1))
+    assert sorted(parents) == list(range(8))
+
+def test_tournament_favours_the_fitter():
+    fitness = np.arange(50, dtype=float)
+    copies = mean_copies(tournament_selection, fitness, tournament_size=5)
+    assert copies[-10:].sum() > copies[:10].sum()
+    assert copies.sum() == pytest.approx(len(fitness))
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        select_parents(np.ones(4), 4, method='roulette')
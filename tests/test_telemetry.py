@@ -0,0 +1,39 @@
+import asyncio
+import json
+from genetic_algorithm import GeneticAlgorithm
+from telemetry import PhaseTimer, TelemetryWriter
+from train import train
+
+def test_phase_timer_adds_up_repeated_phases():
+    timer = PhaseTimer()
+    for _ in range(3):
+        with timer.phase('evaluate'):
+            pass
+    with timer.phase('breed'):
+        pass
+    assert set(timer.times) == {'evaluate', 'breed'}
+    assert all(seconds >= 0 for seconds in timer.times.values())
+
+def test_writer_flushes_queued_records_on_close(tmp_path):
+    writer = TelemetryWriter(tmp_path / 'log.jsonl')
+    for generation in range(100):
+        writer.write({'generation': generation})
+    writer.close()
+    lines = (tmp_path / 'log.jsonl').read_text().splitlines()
+    assert [json.loads(line)['generation'] for line in lines] == list(range(100))
+
+def test_training_writes_one_record_per_generation(tmp_path):
+    gen_alg = GeneticAlgorithm(population_size=30, seed=6)
+    asyncio.run(train(gen_alg, 4, str(tmp_path), 1, profile_generations={2}))
+
+    records = [json.loads(line) for line in (tmp_path / 'game1_telemetry.jsonl').read_text().splitlines()]
+    assert [record['generation'] for record in records] == [1, 2, 3, 4]
+    for record in records:
+        assert {'evaluate', 'breed', 'checkpoint', 'total'} <= set(record['phases'])
+        assert record['phases']['total'] >= record['phases']['evaluate']
+        assert {'min', 'mean', 'max', 'p50'} <= set(record['fitness'])
+        assert record['mean_lifetime'] > 0
+    # The profiled generation's samples, as collapsed stacks
+    for line in (tmp_path / 'game1_gen2.profile').read_text().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert stack and int(count) > 0
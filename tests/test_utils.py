@@ -0,0 +1,36 @@
+import os
+import stat
+import pytest
+from utils import write_atomic
+
+@pytest.mark.skipif(os.name != 'posix', reason="file modes are POSIX")
+@pytest.mark.parametrize('umask', [0o022, 0o077])
+def test_write_atomic_gives_the_umask_mode(tmp_path, umask):
+    previous = os.umask(umask)
+    try:
+        path = tmp_path / 'model.json'
+        assert write_atomic(path, [b'{', b'}']) == 2
+    finally:
+        os.umask(previous)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask
+    assert path.read_bytes() == b'{}'
+
+def test_write_atomic_replaces_and_leaves_no_temp_files(tmp_path):
+    path = tmp_path / 'state.ckpt'
+    write_atomic(path, [b'old'])
+    write_atomic(path, [b'new'])
+    assert path.read_bytes() == b'new'
+    assert os.listdir(tmp_path) == ['state.ckpt']
+
+def test_write_atomic_keeps_the_old_file_when_writing_fails(tmp_path):
+    path = tmp_path / 'state.ckpt'
+    write_atomic(path, [b'old'])
+
+    def failing():
+        yield b'partial'
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        write_atomic(path, failing())
+    assert path.read_bytes() == b'old'
+    assert os.listdir(tmp_path) == ['state.ckpt']
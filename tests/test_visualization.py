@@ -0,0 +1,59 @@
+import os
+import queue
+import numpy as np
+import pytest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+
+from constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from game import SnakeGame
+from live_view import MUTATION_RATE_STEP, run_viewer
+from neural_network import NeuralNetwork
+from population import NetworkPopulation
+from visualization import Renderer, display_interface
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    yield pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.quit()
+
+@pytest.mark.parametrize('grid_size', [10, 23])
+def test_renderer_frames_match_full_redraw(screen, grid_size):
+    # Every incremental frame must show exactly what display_interface draws from scratch
+    np.random.seed(grid_size)
+    network = NeuralNetwork()
+    game = SnakeGame(grid_size=grid_size, rng=np.random.default_rng(grid_size))
+    game.neural_network = network
+    renderer = Renderer(screen, grid_size=grid_size)
+    reference = pygame.Surface(screen.get_size())
+    highscore = frames = 0
+    while game.update() and frames < 60:
+        highscore = max(highscore, game.score)
+        renderer.draw(game, network, 3, game.score, highscore, 0.2)
+        display_interface(reference, game, network, 3, game.score, highscore, 0.2, renderer.snake_size)
+        assert pygame.image.tostring(screen, 'RGB') == pygame.image.tostring(reference, 'RGB')
+        frames += 1
+    assert frames > 0
+
+class ScriptedInbox:
+    """Hands the viewer one genome, presses F and + while it plays, then closes the window."""
+
+    def __init__(self, message):
+        self.message = message
+
+    def get_nowait(self):
+        if self.message is None:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            raise queue.Empty
+        message, self.message = self.message, None
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_f))
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(20, 180), button=1))
+        return message
+
+def test_viewer_plays_a_game_and_reports_clicks():
+    population = NetworkPopulation(1)
+    outbox = queue.Queue()
+    run_viewer(ScriptedInbox((population.genomes[0], population.layer_sizes, 5, 0.1, 12)), outbox, fps=1000)
+    assert outbox.get_nowait() == ('mutation_rate', MUTATION_RATE_STEP)
@@ -0,0 +1,205 @@
+import time
+
+LAUNCH_TIME = time.perf_counter()
+
+import argparse
+import asyncio
+import os
+from game import SnakeGame
+from constants import GRID_SIZE, SAVE_DIR
+from genetic_algorithm import GeneticAlgorithm, SEED_STRATEGIES
+from evolution_strategy import EvolutionStrategy
+from parallel_eval import BACKENDS
+from selection import SELECTION_METHODS
+from checkpoint import CheckpointWriter, load_checkpoint
+from recording import append_recording
+from islands import IslandModel, TOPOLOGIES, TRANSPORTS
+from telemetry import PhaseTimer, SamplingProfiler, TelemetryWriter, generation_record
+
+# Headless trainer: python -m train --help. With --render the best snake is shown
+# by a separate viewer process, so pygame is never imported here.
+
+def load_model(gen_alg, load_path):
+    gen_alg.seed_population(load_path, strategy='clone')
+
+def get_next_game_number(save_folder):
+    existing_files = os.listdir(save_folder)
+    game_numbers = [int(f.split('_')[0][4:]) for f in existing_files if f.startswith('game') and f.endswith('_progress.json')]
+    return max(game_numbers, default=0) + 1
+
+async def train(gen_alg, generations, save_folder, game_number, games_per_network=1, viewer=None,
+                profile_generations=(), retention=None):
+    # One telemetry record per generation goes to gameN_telemetry.jsonl; the generations
+    # in profile_generations are also sampled into gameN_gen{G}.profile. Checkpoints are
+    # written in the background, kept as retention (CheckpointWriter options) says.
+    replay_path = os.path.join(save_folder, f"game{game_number}_replays.bin")
+    telemetry = TelemetryWriter(os.path.join(save_folder, f"game{game_number}_telemetry.jsonl"))
+    checkpoints = CheckpointWriter(save_folder, game_number, **(retention or {}))
+    first_generation = gen_alg.generation
+    try:
+        for generation in range(first_generation, generations):
+            started = time.perf_counter()
+            if generation == first_generation:
+                print(f"Launch to first generation: {started - LAUNCH_TIME:.3f}s")
+            profiler = SamplingProfiler().start() if generation + 1 in profile_generations else None
+            timer = PhaseTimer()
+            if viewer is not None:
+                with timer.phase('controls'):
+                    viewer.apply_controls(gen_alg)
+            with timer.phase('evaluate'):
+                await gen_alg.evaluate_fitness(SnakeGame, games_per_network)
+            with timer.phase('breed'):
+                gen_alg.create_new_generation()
+            with timer.phase('checkpoint'):
+                checkpoints.save(gen_alg)
+            if gen_alg.best_recording is not None:
+                with timer.phase('record'):
+                    append_recording(replay_path, gen_alg.best_recording)
+            if viewer is not None:
+                with timer.phase('publish'):
+                    viewer.publish(gen_alg.best_network(), generation + 1, gen_alg.mutation_rate, gen_alg.grid_size)
+            if profiler is not None:
+                profiler.stop().save(os.path.join(save_folder, f"game{game_number}_gen{generation + 1}.profile"))
+
+            elapsed = time.perf_counter() - started
+            record = generation_record(gen_alg, generation + 1, dict(timer.times, total=elapsed))
+            # Writes that finished in the background since the last generation
+            written = checkpoints.drain()
+            if written:
+                record['checkpoints'] = written
+            telemetry.write(record)
+            stats = gen_alg.evaluation_stats
+            skipped = f", {stats['ticks']} ticks, {stats['ticks_skipped']} skipped" if stats else ""
+            if 'cache' in stats:
+                skipped += f", cache hit rate {stats['cache']['hit_rate']:.0%}"
+            if written:
+                skipped += (f", wrote {sum(w['bytes'] for w in written) / 1e6:.1f}MB "
+                            f"in {sum(w['seconds'] for w in written):.2f}s")
+            print(f"Generation {generation + 1}/{generations} ({elapsed:.2f}s{skipped})")
+    finally:
+        try:
+            checkpoints.close()
+            for write in checkpoints.drain():
+                print(f"Checkpoint of generation {write['generation']}: {write['bytes'] / 1e6:.1f}MB "
+                      f"in {write['seconds']:.2f}s")
+        finally:
+            telemetry.close()
+    return game_number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m train", description="Train snake networks with the genetic algorithm.")
+    parser.add_argument("--engine", choices=("ga", "es"), default="ga",
+                        help="genetic algorithm, or an OpenAI-style evolution strategy")
+    parser.add_argument("--population-size", type=int, default=3000)
+    parser.add_argument("--mutation-rate", type=float, default=0.2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--elitism-rate", type=float, default=0.1)
+    parser.add_argument("--generations", type=int, default=5000)
+    parser.add_argument("--games-per-network", type=int, default=1)
+    parser.add_argument("--backend", choices=BACKENDS, default="serial")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--selection", choices=tuple(SELECTION_METHODS), default="tournament")
+    parser.add_argument("--tournament-size", type=int, default=75)
+    parser.add_argument("--save-dir", default=SAVE_DIR)
+    parser.add_argument("--load", nargs="+", default=[],
+                        help="a .ckpt checkpoint to resume, or one or more model .json files to seed from")
+    parser.add_argument("--seed-strategy", choices=SEED_STRATEGIES, default="clone")
+    parser.add_argument("--noise-scale", type=float, default=0.1)
+    parser.add_argument("--fresh-fraction", type=float, default=0.5)
+    parser.add_argument("--record", action="store_true", help="append each generation's best game to gameN_replays.bin")
+    parser.add_argument("--no-cycle-detection", dest="cycle_detection", action="store_false",
+                        help="play looping snakes out until their moves run out")
+    parser.add_argument("--doomed-check", action="store_true",
+                        help="end games whose head is sealed off from the food (approximate)")
+    parser.add_argument("--eval-seed", type=int, default=None,
+                        help="play the same seeded food every generation, which enables the fitness cache")
+    parser.add_argument("--cache-size", type=int, default=None,
+                        help="fitness cache entries with --eval-seed, 0 to disable (default: twice the population)")
+    parser.add_argument("--racing", type=int, default=None, metavar="ETA",
+                        help="successive halving: every network plays one game and the best 1/ETA play ETA times "
+                             "as many, up to --games-per-network")
+    parser.add_argument("--profile", nargs="+", type=int, default=[], metavar="GENERATION",
+                        help="sample the stack during these generations into gameN_genG.profile")
+    parser.add_argument("--sigma", type=float, default=0.1, help="evolution strategy noise scale")
+    parser.add_argument("--learning-rate", type=float, default=0.03, help="evolution strategy Adam step size")
+    parser.add_argument("--islands", type=int, default=0,
+                        help="run this many populations in separate processes, with migration between them")
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument("--migration-interval", type=int, default=10)
+    parser.add_argument("--migrants", type=int, default=5, help="best genomes each island sends per migration")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="pipe")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE,
+                        help="board width and height; vision is scale-free, so models trained on one size seed the next")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed every random stream of the run; the same seed gives the same run on any backend")
+    parser.add_argument("--keep-last", type=int, default=3, help="checkpoints of the latest generations to keep")
+    parser.add_argument("--keep-every", type=int, default=0, metavar="N",
+                        help="also keep the checkpoint of every Nth generation (0: none)")
+    parser.add_argument("--no-keep-best", dest="keep_best", action="store_false",
+                        help="don't keep the checkpoint of the generation with the best fitness")
+    parser.add_argument("--render", action="store_true", help="show the best snake of every generation")
+    return parser.parse_args(argv)
+
+def ga_options(args):
+    return dict(population_size=args.population_size, mutation_rate=args.mutation_rate,
+                batch_size=args.batch_size, elitism_rate=args.elitism_rate,
+                max_generations=args.generations, selection=args.selection, tournament_size=args.tournament_size,
+                cycle_detection=args.cycle_detection, doomed_check=args.doomed_check, eval_seed=args.eval_seed,
+                cache_size=args.cache_size, racing_eta=args.racing, grid_size=args.grid_size, seed=args.seed)
+
+def train_islands(args, game_number):
+    # Every island is a full population of --population-size in its own process
+    model = IslandModel(args.islands, args.topology, args.migration_interval, args.migrants, args.transport,
+                        **ga_options(args))
+
+    def report(generation, best, mean, ticks):
+        print(f"Generation {generation}/{args.generations} (best {best:.0f}, mean {mean:.0f}, {ticks} ticks)")
+
+    model.run(args.generations, args.games_per_network, seed=args.seed, report=report)
+    model.best_network().save(os.path.join(args.save_dir, f"game{game_number}_progress.json"))
+
+async def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.save_dir, exist_ok=True)
+    game_number = get_next_game_number(args.save_dir)
+
+    if args.islands:
+        if args.load or args.render or args.engine != 'ga':
+            raise SystemExit("--islands runs the genetic algorithm and cannot be combined with --load or --render")
+        train_islands(args, game_number)
+        print(f"Progress saved in: {args.save_dir}")
+        return
+
+    if args.engine == 'es':
+        gen_alg = EvolutionStrategy(population_size=args.population_size, sigma=args.sigma,
+                                    learning_rate=args.learning_rate, backend=args.backend, workers=args.workers,
+                                    record_best=args.record, cycle_detection=args.cycle_detection,
+                                    doomed_check=args.doomed_check, eval_seed=args.eval_seed,
+                                    max_generations=args.generations, grid_size=args.grid_size, seed=args.seed)
+    else:
+        gen_alg = GeneticAlgorithm(backend=args.backend, workers=args.workers, record_best=args.record,
+                                   **ga_options(args))
+    if len(args.load) == 1 and args.load[0].endswith('.ckpt'):
+        load_checkpoint(gen_alg, args.load[0])
+    elif args.load:
+        gen_alg.seed_population(args.load, strategy=args.seed_strategy, noise_scale=args.noise_scale,
+                                fresh_fraction=args.fresh_fraction)
+
+    viewer = None
+    if args.render:
+        from live_view import LiveViewer
+
+        viewer = LiveViewer()
+    try:
+        await train(gen_alg, args.generations, args.save_dir, game_number, args.games_per_network, viewer,
+                    set(args.profile), dict(keep_last=args.keep_last, keep_every=args.keep_every,
+                                            keep_best=args.keep_best))
+    finally:
+        gen_alg.evaluator.close()
+        if viewer is not None:
+            viewer.close()
+
+    print(f"Progress saved in: {args.save_dir}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
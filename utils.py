@@ -1,29 +1,73 @@
 # utils.py
+import os
+import numpy as np
+
+def write_atomic(path, chunks):
+    # Readers see the old file or the new one, never a partial write. The temp file is
+    # created with mode 0o666 like open() would, so the umask gives it the usual mode.
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.urandom(6).hex()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            written = 0
+            for chunk in chunks:
+                written += f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return written
 
 def normalize(x, max_value):
     return x / max_value if max_value else 0
 
 def calculate_distances(snake, food, grid_size):
-    head_x, head_y = snake.body[0]
-    directions = [
-        (-1, 0), (1, 0), (0, -1), (0, 1),  # N, S, W, E
-        (-1, -1), (-1, 1), (1, -1), (1, 1)  # NW, NE, SW, SE
-    ]
-
+    # Like Snake.look, but with normalized step counts and rays that stop at the body
+    rays, wall_steps = ray_table(grid_size)
+    head = snake.cell_index(snake.body[0])
+    steps = np.arange(1, grid_size + 1)
     vision = []
-    for d in directions:
-        dist_food, dist_body, dist_wall = 0, 0, 0
-        step = 1
-        while True:
-            x, y = head_x + d[0] * step, head_y + d[1] * step
-            if not (0 <= x < grid_size and 0 <= y < grid_size):
-                dist_wall = step
-                break
-            if (x, y) == food:
-                dist_food = step
-            if (x, y) in snake.body[1:]:
-                dist_body = step
-                break
-            step += 1
+    for d in range(len(VISION_DIRECTIONS)):
+        ray = rays[head, d]
+        body_hits = np.flatnonzero(snake.occupancy[ray] > 0)
+        reach = body_hits[0] + 1 if len(body_hits) else len(ray)
+        food_hits = np.flatnonzero(ray[:reach] == snake.cell_index(food))
+        dist_food = steps[food_hits[0]] if len(food_hits) else 0
+        dist_body = steps[body_hits[0]] if len(body_hits) else 0
+        dist_wall = 0 if len(body_hits) else wall_steps[head, d]
         vision.extend([normalize(dist_food, grid_size), normalize(dist_body, grid_size), normalize(dist_wall, grid_size)])
-    return vision
\ No newline at end of file
+    return vision
+
+
+# Vision order shared by Snake.look and the batched environment: N, S, W, E, NW, NE, SW, SE
+VISION_DIRECTIONS = [
+    (-1, 0), (1, 0), (0, -1), (0, 1),
+    (-1, -1), (-1, 1), (1, -1), (1, 1)
+]
+
+_ray_table_cache = {}
+
+def ray_table(grid_size):
+    # For every cell and vision direction, the flat indices of the cells a ray passes
+    # through before leaving the board, padded with grid_size ** 2, plus the step at
+    # which the ray leaves the board.
+    if grid_size in _ray_table_cache:
+        return _ray_table_cache[grid_size]
+
+    num_cells = grid_size * grid_size
+    x, y = np.divmod(np.arange(num_cells), grid_size)
+    steps = np.arange(1, grid_size + 1)
+    rays = np.full((num_cells, len(VISION_DIRECTIONS), grid_size), num_cells, dtype=np.int32)
+    wall_steps = np.zeros((num_cells, len(VISION_DIRECTIONS)), dtype=np.int32)
+    for d, (dx, dy) in enumerate(VISION_DIRECTIONS):
+        ray_x = x[:, None] + dx * steps
+        ray_y = y[:, None] + dy * steps
+        # Rays are straight, so once off the board they stay off
+        on_board = (ray_x >= 0) & (ray_x < grid_size) & (ray_y >= 0) & (ray_y < grid_size)
+        rays[:, d] = np.where(on_board, ray_x * grid_size + ray_y, num_cells)
+        wall_steps[:, d] = on_board.sum(axis=1) + 1
+    _ray_table_cache[grid_size] = (rays, wall_steps)
+    return rays, wall_steps
@@ -1,10 +1,10 @@
 import pygame
-from constants import GRID_SIZE, SNAKE_SIZE, WHITE, BLACK, GREEN, RED, BLUE, GRAY
+from constants import GRID_SIZE, SCREEN_HEIGHT, WHITE, BLACK, GREEN, RED, BLUE, GRAY
 
 def display_game(screen, game, snake_size):
     # Draw game grid
-    grid_width = snake_size * GRID_SIZE
-    grid_height = snake_size * GRID_SIZE
+    grid_width = snake_size * game.grid_size
+    grid_height = snake_size * game.grid_size
     game_x_offset = 300  # Offset for the game grid
     pygame.draw.rect(screen, WHITE, [game_x_offset, 0, grid_width, grid_height], 2)
 
@@ -17,8 +17,19 @@ def display_game(screen, game, snake_size):
     pygame.draw.rect(screen, RED,
                      (game_x_offset + game.food[1] * snake_size, game.food[0] * snake_size, snake_size, snake_size))
 
+_fonts = {}
+
+def get_font(size=36):
+    # Creating a Font loads it from disk, so keep one per size. Fonts die with
+    # pygame.quit(), which runs its quit functions once, hence registering again.
+    if not _fonts:
+        pygame.register_quit(_fonts.clear)
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
+
 def display_stats(screen, generation, score, highscore, mutation_rate):
-    font = pygame.font.Font(None, 36)
+    font = get_font()
     gen_text = font.render(f"Generation: {generation}", True, WHITE)
     score_text = font.render(f"Score: {score}", True, WHITE)
     highscore_text = font.render(f"High Score: {highscore}", True, WHITE)
@@ -84,4 +95,99 @@ def display_interface(screen, game, network, generation, score, highscore, mutat
     # Display game grid on the right
     display_game(screen, game, snake_size)
     
-    pygame.display.update()
\ No newline at end of file
+    pygame.display.update()
+
+class Renderer:
+    """Incremental version of display_interface.
+
+    The panel with the network diagram is rendered once per network, text labels are
+    cached, and after the first frame of a game only the grid cells that changed (new
+    head, vacated tail, old and new food) and the stats are redrawn and pushed to the
+    display as dirty rects.
+    """
+
+    def __init__(self, screen, snake_size=None, grid_size=GRID_SIZE, panel_width=300):
+        self.screen = screen
+        # Cells shrink as the board grows so it always fits the screen height
+        snake_size = snake_size if snake_size is not None else SCREEN_HEIGHT // grid_size
+        self.snake_size = snake_size
+        self.grid_size = grid_size
+        self.panel_width = panel_width
+        self.grid_rect = pygame.Rect(panel_width, 0, snake_size * grid_size, snake_size * grid_size)
+        self.stats_rect = pygame.Rect(0, 0, panel_width, 170)
+        self.panel = None
+        self.network = None
+        self.game = None
+        self.labels = {}
+        self.stats = None
+        self.cells = ()
+
+    def set_network(self, network):
+        if network is self.network:
+            return
+        self.network = network
+        panel_height = self.screen.get_height()
+        self.panel = pygame.Surface((self.panel_width, panel_height))
+        self.panel.fill(GRAY)
+        draw_neural_network(self.panel, network, 10, 200, self.panel_width - 20, panel_height - 240)
+        pygame.draw.rect(self.panel, WHITE, (10, 170, 50, 30))
+        pygame.draw.rect(self.panel, WHITE, (70, 170, 50, 30))
+        self.panel.blit(self.label("+", BLACK), (25, 175))
+        self.panel.blit(self.label("-", BLACK), (85, 175))
+        self.game = None
+
+    def label(self, text, color=WHITE):
+        key = (text, color)
+        if key not in self.labels:
+            if len(self.labels) > 256:
+                self.labels.clear()
+            self.labels[key] = get_font().render(text, True, color)
+        return self.labels[key]
+
+    def cell_rect(self, cell):
+        return pygame.Rect(self.grid_rect.x + cell[1] * self.snake_size, cell[0] * self.snake_size,
+                           self.snake_size, self.snake_size)
+
+    def paint_cell(self, game, cell):
+        # Same layering as display_game: background, grid border, snake, food on top
+        rect = self.cell_rect(cell)
+        self.screen.set_clip(rect)
+        self.screen.fill(BLACK, rect)
+        pygame.draw.rect(self.screen, WHITE, self.grid_rect, 2)
+        if cell == game.food:
+            self.screen.fill(RED, rect)
+        elif game.snake.occupies(cell):
+            self.screen.fill(WHITE, rect)
+        self.screen.set_clip(None)
+        return rect
+
+    def draw_stats(self, generation, score, highscore, mutation_rate):
+        self.screen.blit(self.panel, self.stats_rect, self.stats_rect)
+        self.screen.blit(self.label(f"Generation: {generation}"), (10, 10))
+        self.screen.blit(self.label(f"Score: {score}"), (10, 50))
+        self.screen.blit(self.label(f"High Score: {highscore}"), (10, 90))
+        self.screen.blit(self.label(f"Mutation Rate: {mutation_rate:.1%}"), (10, 130))
+        return self.stats_rect
+
+    def draw(self, game, network, generation, score, highscore, mutation_rate):
+        self.set_network(network)
+        stats = (generation, score, highscore, mutation_rate)
+        cells = (game.snake.body[0], game.snake.body[-1], game.food)
+
+        if game is not self.game:
+            # First frame of a game: draw everything once
+            self.screen.fill(BLACK)
+            self.screen.blit(self.panel, (0, 0))
+            self.draw_stats(*stats)
+            display_game(self.screen, game, self.snake_size)
+            pygame.display.update()
+        else:
+            dirty = []
+            if stats != self.stats:
+                dirty.append(self.draw_stats(*stats))
+            for cell in set(self.cells + cells):
+                if 0 <= cell[0] < self.grid_size and 0 <= cell[1] < self.grid_size:
+                    dirty.append(self.paint_cell(game, cell))
+            pygame.display.update(dirty)
+
+        self.game, self.stats, self.cells = game, stats, cells